@@ -0,0 +1,170 @@
+import copy
+import math
+
+
+def camp_squares(size):
+    # (row, col) of the squares player one and player two start on, as reset_board
+    # laid them out
+    player_one_positions = [(size - 1 - row, size - 1 - col) for row in range(4) for col in range(4) if row + col < 4]
+    player_two_positions = [(row, col) for row in range(4) for col in range(4) if row + col < 4]
+    return player_one_positions, player_two_positions
+
+
+def start_board(size):
+    board = [[0 for x in range(size)] for y in range(size)]
+    player_one_positions, player_two_positions = camp_squares(size)
+    for row, col in player_one_positions:
+        board[row][col] = 1
+    for row, col in player_two_positions:
+        board[row][col] = 2
+    return board
+
+
+class BaselineSearch:
+    # The AI as it was before the engine package: minimax over list of lists boards,
+    # copying the board for every child and every move it sorts, and cutting the move
+    # list down by the depth of the root. Kept as the reference benchmark.py measures
+    # the engine against.
+
+    def __init__(self, size):
+        self.grid_size = size
+        self.player_one_positions, self.player_two_positions = camp_squares(size)
+        self.depth = 1
+        self.nodes = 0
+
+    def best_move(self, position, depth, max_player):
+        self.depth = depth
+        self.nodes = 0
+        return self.minimax(copy.deepcopy(position), depth, -math.inf, math.inf, max_player)
+
+    def minimax(self, position, depth, alpha, beta, max_player):
+        self.nodes += 1
+        if depth <= 0 or self.check_win(position):
+            return self.evaluate(position), None
+        valid_moves = self.get_valid_moves(position, max_player)
+        valid_moves = self.sort_moves(position, valid_moves, max_player)
+
+        # Cut down moves to be analysed
+        cutoff = max(int(len(valid_moves) // (self.depth**(self.depth/2))) + 1, 3)
+        valid_moves = valid_moves[:cutoff]
+        best_move = None
+
+        if max_player:
+            max_eval = -math.inf
+            for move in valid_moves:
+                new_pos = self.apply_move(copy.deepcopy(position), move)
+                eval = self.minimax(new_pos, depth - 1, alpha, beta, False)[0]
+                if eval > max_eval:
+                    max_eval = eval
+                    best_move = move
+                alpha = max(alpha, eval)
+                if beta <= alpha:
+                    break
+            return (max_eval, best_move)
+        else:
+            min_eval = math.inf
+            for move in valid_moves:
+                new_pos = self.apply_move(copy.deepcopy(position), move)
+                eval = self.minimax(new_pos, depth - 1, alpha, beta, True)[0]
+                if eval < min_eval:
+                    min_eval = eval
+                    best_move = move
+                beta = min(beta, eval)
+                if beta <= alpha:
+                    break
+            return (min_eval, best_move)
+
+    def sort_moves(self, position, valid_moves, max_player):
+        eval_move = sorted([(self.evaluate(self.apply_move(copy.deepcopy(position), move)), move) for move in valid_moves])
+        if max_player:
+            eval_move = eval_move[::-1]
+        return [combo[1] for combo in eval_move]
+
+    def evaluate(self, position):
+        win = self.check_win(position)
+        if win == 1:
+            return self.grid_size * 50
+        elif win == 2:
+            return - self.grid_size * 50
+        score = 0
+        for i in range(self.grid_size):
+            for j in range(self.grid_size):
+                if position[i][j] == 1:
+                    score -= (i + j)
+                elif position[i][j] == 2:
+                    score += ((self.grid_size - 1 - i) + (self.grid_size - 1 - j))
+        return score
+
+    def get_valid_moves(self, position, max_player):
+        moves = []
+        jumps = []
+        player = 1 if max_player else 2
+        for row in range(self.grid_size):
+            for col in range(self.grid_size):
+                if position[row][col] == player:
+                    for x in range(-2, 3):
+                        for y in range(-2, 3):
+                            if 0 <= (row + x) < self.grid_size and 0 <= (col + y) < self.grid_size:
+                                valid, jumping = self.valid_move(position, row, col, row + x, col + y)
+                                if valid:
+                                    if jumping:
+                                        jumps.append((row, col, row + x, col + y))
+                                    else:
+                                        moves.append((row, col, row + x, col + y))
+        changed = True
+        while changed:
+            changed = False
+            new = []
+            for jump in jumps:
+                new_pos = self.apply_move(copy.deepcopy(position), jump)
+                for x in range(-2, 3, 2):
+                    for y in range(-2, 3, 2):
+                        if 0 <= (jump[2] + x) < self.grid_size and 0 <= (jump[3] + y) < self.grid_size and not (jump[0] == jump[2] + x and jump[1] == jump[3] + y):
+                            if (jump[0], jump[1], jump[2] + x, jump[3] + y) not in jumps and self.valid_move(new_pos, jump[2], jump[3], jump[2] + x, jump[3] + y)[0]:
+                                    new.append((jump[0], jump[1], jump[2] + x, jump[3] + y))
+                                    changed = True
+            jumps = new + jumps
+        return jumps + moves
+
+    def valid_move(self, position, src_row, src_col, dest_row, dest_col):
+        # The AI never searched part way through a hand move's jump chain, so the
+        # jumping and jumped_from checks of the GUI's version are left out
+        vector = (dest_row - src_row, dest_col - src_col)
+        jump = False
+        valid = False
+        if (vector[0] == 0 or abs(vector[0]) == 1) and (vector[1] == 0 or abs(vector[1]) == 1):
+            valid = True
+        elif (vector[0] == 0 or abs(vector[0]) == 2) and (vector[1] == 0 or abs(vector[1]) == 2) \
+            and position[src_row + vector[0] // 2][src_col + vector[1] // 2] != 0:
+            valid = True
+            jump = True
+        if position[dest_row][dest_col] != 0:
+            valid = False
+        return valid, jump
+
+    def apply_move(self, position, move):
+        player = position[move[0]][move[1]]
+        position[move[0]][move[1]] = 0
+        position[move[2]][move[3]] = player
+        return position
+
+    def check_win(self, position):
+        win = True
+        enemy = False
+        for coords in self.player_one_positions:
+            if position[coords[0]][coords[1]] == 0:
+                win = False
+            elif position[coords[0]][coords[1]] == 2:
+                enemy = True
+        if win and enemy:
+            return 2
+        win = True
+        enemy = False
+        for coords in self.player_two_positions:
+            if position[coords[0]][coords[1]] == 0:
+                win = False
+            elif position[coords[0]][coords[1]] == 1:
+                enemy = True
+        if win and enemy:
+            return 1
+        return 0
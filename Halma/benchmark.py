@@ -0,0 +1,202 @@
+import argparse
+import math
+import random
+import time
+from baseline import BaselineSearch, start_board
+from engine import MCTS, ParallelSearch, Position, Search, SearchControl, play_game
+
+
+class MakeUnmakeSearch(BaselineSearch):
+    # The baseline search with its board changed in place and put back after each
+    # child instead of copied, everything else the same, so it searches exactly the
+    # same tree in the same order
+
+    def minimax(self, position, depth, alpha, beta, max_player):
+        self.nodes += 1
+        if depth <= 0 or self.check_win(position):
+            return self.evaluate(position), None
+        valid_moves = self.get_valid_moves(position, max_player)
+        valid_moves = self.sort_moves(position, valid_moves, max_player)
+        cutoff = max(int(len(valid_moves) // (self.depth**(self.depth/2))) + 1, 3)
+        best_eval = -math.inf if max_player else math.inf
+        best_move = None
+        for move in valid_moves[:cutoff]:
+            self.apply_move(position, move)
+            eval = self.minimax(position, depth - 1, alpha, beta, not max_player)[0]
+            self.undo_move(position, move)
+            if (max_player and eval > best_eval) or (not max_player and eval < best_eval):
+                best_eval = eval
+                best_move = move
+            if max_player:
+                alpha = max(alpha, eval)
+            else:
+                beta = min(beta, eval)
+            if beta <= alpha:
+                break
+        return (best_eval, best_move)
+
+    def sort_moves(self, position, valid_moves, max_player):
+        eval_move = []
+        for move in valid_moves:
+            self.apply_move(position, move)
+            eval_move.append((self.evaluate(position), move))
+            self.undo_move(position, move)
+        eval_move.sort()
+        if max_player:
+            eval_move = eval_move[::-1]
+        return [combo[1] for combo in eval_move]
+
+    def undo_move(self, position, move):
+        position[move[0]][move[1]] = position[move[2]][move[3]]
+        position[move[2]][move[3]] = 0
+
+
+def midgame_position(size, plies, seed=1):
+    # Reproducible crowded position reached by random moves from the start
+    generator = random.Random(seed)
+    position = Position.start(size)
+    for ply in range(plies):
+        moves = position.get_moves(1 + ply % 2)
+        position.apply_move(generator.choice(moves))
+    return position
+
+
+def bench_movegen(size, repeats):
+    position = midgame_position(size, 40)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        count = len(position.get_moves(1)) + len(position.get_moves(2))
+    elapsed = time.perf_counter() - start
+    print(f"Move generation in a {size}x{size} mid-game position")
+    print(f"  {count} moves  {elapsed / repeats * 1e6:.0f} us per position  {count * repeats / elapsed:.0f} moves/s")
+
+
+def bench_search(size, depth, repeats):
+    # The original search copying the board for every child against the same search
+    # making and unmaking moves on one board, best of several runs from the start
+    # position with player one to move. Both search the same tree, so their node
+    # counts and results must match.
+    print(f"Baseline search from the {size}x{size} start position, depth {depth}")
+    for name, search in (("deepcopy", BaselineSearch(size)), ("make/unmake", MakeUnmakeSearch(size))):
+        best = 0
+        for _ in range(repeats):
+            board = start_board(size)
+            start = time.perf_counter()
+            eval, move = search.best_move(board, depth, True)
+            best = max(best, search.nodes / (time.perf_counter() - start))
+        print(f"  {name:<14} {search.nodes:>8} nodes {best:>10.0f} nodes/s  eval {eval} move {move}")
+
+
+def bench_deepening(size, depth):
+    # Search the same root at increasing depth like the analysis panel does
+    print(f"Repeated search from the {size}x{size} start position, depths 1 to {depth}")
+    for name, search in (("no table", Search(0)), ("with table", Search())):
+        total = 0
+        start = time.perf_counter()
+        for d in range(1, depth + 1):
+            eval, move = search.best_move(Position.start(size), d, True)
+            total += search.nodes
+        elapsed = time.perf_counter() - start
+        print(f"  {name:<14} {total:>8} nodes {elapsed:>8.2f} s  eval {eval} move {move}")
+
+
+def bench_time_control(size, time_limit):
+    # How deep the AI gets when it has to move within the time limit
+    print(f"Iterative deepening from the {size}x{size} start position, {time_limit * 1000:.0f} ms")
+    search = Search()
+    start = time.perf_counter()
+    eval, move, depth = search.iterative_deepening(Position.start(size), True, 50, SearchControl(time_limit))
+    elapsed = time.perf_counter() - start
+    print(f"  depth {depth} in {elapsed * 1000:.0f} ms, {search.nodes} nodes  eval {eval} move {move}")
+
+
+def bench_pruning(size, depth, positions):
+    # Nodes searched by each pruning switch, and how often the result matches a
+    # full width search of the same depth
+    print(f"Pruning against full width search of {positions} {size}x{size} mid-game positions, depth {depth}")
+    options = (
+        ("full width", {"pvs": False, "lmr": False, "futility": False}),
+        ("pvs", {"pvs": True, "lmr": False, "futility": False}),
+        ("pvs+lmr", {"pvs": True, "lmr": True, "futility": False}),
+        ("pvs+lmr+futility", {"pvs": True, "lmr": True, "futility": True}),
+    )
+    results = {}
+    for name, switches in options:
+        search = Search(**switches)
+        nodes = 0
+        start = time.perf_counter()
+        results[name] = []
+        for seed in range(positions):
+            position = midgame_position(size, 20 + seed, seed)
+            search.table.clear()
+            results[name].append(search.best_move(position, depth, seed % 2 == 0))
+            nodes += search.nodes
+        elapsed = time.perf_counter() - start
+        same_move = sum(result[1] == full[1] for result, full in zip(results[name], results["full width"]))
+        same_eval = sum(result[0] == full[0] for result, full in zip(results[name], results["full width"]))
+        print(f"  {name:<17} {nodes:>8} nodes {elapsed:>7.2f} s  same move {same_move}/{positions}  same eval {same_eval}/{positions}")
+
+
+def bench_parallel(size, depth, workers, positions):
+    # Serial and root parallel search must agree at equal depth without reductions,
+    # checked on positions from early to late in the game with either side to move
+    print(f"Serial and {workers or 'one per core'} worker search of {positions} {size}x{size} mid-game positions, depth {depth}")
+    parallel = ParallelSearch(workers, lmr=False, futility=False)
+    parallel.start()
+    serial_time = parallel_time = 0
+    same = 0
+    for seed in range(positions):
+        position = midgame_position(size, 10 + seed * 3 % 40, seed)
+        max_player = seed % 2 == 0
+        start = time.perf_counter()
+        serial_result = Search(lmr=False, futility=False).best_move(position, depth, max_player)
+        serial_time += time.perf_counter() - start
+        start = time.perf_counter()
+        parallel_result = parallel.best_move(position, depth, max_player)
+        parallel_time += time.perf_counter() - start
+        if serial_result == parallel_result:
+            same += 1
+        else:
+            print(f"  DIFFERENT on seed {seed}: serial {serial_result}  parallel {parallel_result}")
+    parallel.close()
+    print(f"  same result {same}/{positions}  serial {serial_time:.2f} s  parallel {parallel_time:.2f} s")
+    return same == positions
+
+
+def bench_mcts(size, time_limit, games):
+    # Tree search against minimax at the same time a move, each side playing first in
+    # half the games, with the points scored per CPU second spent thinking
+    print(f"MCTS against minimax, {games} {size}x{size} games at {time_limit * 1000:.0f} ms a move")
+    for name, rollout in (("mcts", 0), ("mcts+rollout", 4)):
+        points = {"minimax": 0.0, name: 0.0}
+        cpu = {"minimax": 0.0, name: 0.0}
+        for game in range(games):
+            mcts_player = 1 + game % 2
+            engines = {mcts_player: (MCTS(rollout=rollout, seed=game), 50, time_limit), 3 - mcts_player: (Search(), 50, time_limit)}
+            names = {mcts_player: name, 3 - mcts_player: "minimax"}
+            winner, finished, positions, stats = play_game(engines, size, max_plies=300)
+            for player in (1, 2):
+                cpu[names[player]] += stats[player][3]
+                points[names[player]] += 0.5 if winner == 0 else winner == player
+        for engine in points:
+            print(f"  {engine:<13} {points[engine]:>5.1f}/{games} points {cpu[engine]:>7.1f} CPU s  {points[engine] / max(cpu[engine], 1e-9):.3f} points per CPU s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Halma engine benchmarks")
+    parser.add_argument("--size", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--time", type=float, default=0.5, help="seconds allowed for the timed search")
+    parser.add_argument("--workers", type=int, default=0, help="processes for the parallel search, 0 for one per core")
+    parser.add_argument("--positions", type=int, default=10, help="positions for the pruning comparison")
+    parser.add_argument("--parallel-positions", type=int, default=40, help="positions the parallel search is checked against the serial one on")
+    parser.add_argument("--games", type=int, default=4, help="games of the MCTS against minimax match")
+    args = parser.parse_args()
+    bench_movegen(args.size, args.repeats * 100)
+    bench_search(args.size, args.depth, args.repeats)
+    bench_deepening(args.size, args.depth)
+    bench_time_control(args.size, args.time)
+    bench_pruning(args.size, args.depth, args.positions)
+    bench_parallel(args.size, args.depth, args.workers or None, args.parallel_positions)
+    bench_mcts(args.size, args.time, args.games)
@@ -0,0 +1,500 @@
+import sqlite3
+from engine.record import decode_row, encode_positions
+
+class DatabaseManager:
+    # Columns of the rows get_player_games returns, that get_games_page can sort by
+    GAME_COLUMNS = ("game_id", "player_one.name", "player_two.name", "result", "board_size", "date_played", "time_played", "num_moves")
+    # Version of the database layout, kept in SQLite's user_version
+    # 1: moves stored in binary instead of board text
+    SCHEMA_VERSION = 1
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.con = None
+
+    def create_con(self):
+        if not self.con:
+            try:
+                self.con = sqlite3.connect(self.db_name)
+            except Exception as e:
+                print(e)
+                return False
+        return True
+    
+    def close_con(self):
+        # Create a connection
+        if self.con:
+            self.con.close()
+    
+    def create_table(self, sql):
+        # Create connection
+        self.create_con()
+        try:
+            # Execute the query
+            cursor = self.con.cursor()
+            cursor.execute(sql)
+        except Exception as e:
+            print(e)
+        # Save changes
+        self.con.commit()
+
+    def add_config(self, board_size, board_colours, theme):
+        self.create_con()
+        # Create query
+        query = """INSERT INTO config(board_size, board_colours, theme) VALUES (?, ?, ?);"""
+        # Execute query
+        cursor = self.con.cursor()
+        cursor.execute(query, (board_size, board_colours, theme))
+        # Save changes
+        self.con.commit()
+    
+    def configs_exist(self):
+        self.create_con()
+        # Create query
+        query = """SELECT COUNT(*) FROM config"""
+        # Execute query
+        cursor = self.con.cursor()
+        num = cursor.execute(query).fetchall()[0][0]
+        # Return if any records exist
+        return True if num else False
+    
+    def get_last_config(self):
+        self.create_con()
+        # Create query
+        query = f"""SELECT board_size, board_colours, theme FROM config WHERE config_id=(SELECT MAX(config_id) FROM config);"""
+        # Execute query
+        cursor = self.con.cursor()
+        config = cursor.execute(query).fetchall()[0]
+        return config
+    
+    def player_exists(self, player_name):
+        self.create_con()
+        # Create query, answered by the unique index on player names
+        query = """SELECT 1 FROM player WHERE name = ?;"""
+        # Execute query
+        cursor = self.con.cursor()
+        return cursor.execute(query, (player_name,)).fetchone() is not None
+    
+    def get_player_id(self, player_name):
+        self.create_con()
+        # Create query
+        query = """SELECT player_id FROM player WHERE name = ?;"""
+        # Execute query
+        cursor = self.con.cursor()
+        id = cursor.execute(query, (player_name,)).fetchall()[0][0]
+        return id
+    
+    def get_player_name(self, id):
+        self.create_con()
+        # Create query
+        query = """SELECT name FROM player WHERE player_id = ?;"""
+        # Execute query
+        cursor = self.con.cursor()
+        name = cursor.execute(query, (id,)).fetchall()[0][0]
+        return name
+    
+    def add_player(self, player, ai):
+        self.create_con()
+        # Check if player name already used
+        if not self.player_exists(player):
+            # Set correct AI field value
+            ai = 1 if ai else 0
+            # Create query
+            query = """INSERT INTO player(name, ai, active) VALUES (?, ?, 1);"""
+            # Execute query
+            cursor = self.con.cursor()
+            cursor.execute(query, (player, ai))
+            # Save changes
+            self.con.commit()
+            return True
+        else:
+            return False
+    
+    def disable_player(self, player_name):
+        self.create_con()
+        # Create query
+        query = """UPDATE player
+                    SET active = 0
+                    WHERE
+                        name = ?;"""
+        # Execute query
+        cursor = self.con.cursor()
+        cursor.execute(query, (player_name,))
+        # Save changes
+        self.con.commit()
+        
+    def get_player_names(self):
+        self.create_con()
+        # Create query
+        sql_get_player_names = """SELECT name FROM player WHERE ai = 0 AND active = 1;"""
+        # Execute query
+        cursor = self.con.cursor()
+        # Add players to a list
+        players = []
+        for x in cursor.execute(sql_get_player_names).fetchall():
+            players.append(x[0])
+        return players
+    
+    def add_game(self, player_one_id, player_two_id, result, board_size, date_played, time_played, num_moves):
+        self.create_con()
+        # Put field values in a list
+        values = [player_one_id, player_two_id, result, board_size, date_played, time_played, num_moves]
+        # Create query
+        query = """INSERT INTO game(player_one_id, player_two_id, result, board_size, date_played, time_played, num_moves) VALUES (?,?,?,?,?,?,?);"""
+        # Execute query
+        cursor = self.con.cursor()
+        cursor.execute(query, values)
+        # Save changes
+        self.con.commit()
+        # Return game id of the record just inserted
+        return cursor.lastrowid
+    
+    def add_move(self, game_id, move_id, position):
+        self.create_con()
+        # Put field values in a list
+        values = [game_id, move_id, position]
+        # Create query
+        query = """INSERT INTO move(game_id, move_id, position) VALUES (?,?,?);"""
+        # Execute query
+        cursor = self.con.cursor()
+        cursor.execute(query, values)
+        # Save changes
+        self.con.commit()
+
+    def add_games(self, games):
+        # Add several finished games with all of their moves in one transaction. Each
+        # game is (player_one_id, player_two_id, result, board_size, date_played,
+        # time_played, num_moves, rows) with the rows of every position from encode_positions.
+        self.create_con()
+        # Create queries
+        query_game = """INSERT INTO game(player_one_id, player_two_id, result, board_size, date_played, time_played, num_moves) VALUES (?,?,?,?,?,?,?);"""
+        query_move = """INSERT INTO move(game_id, move_id, position) VALUES (?,?,?);"""
+        # Execute queries, saving the changes once at the end
+        cursor = self.con.cursor()
+        game_ids = []
+        with self.con:
+            for *values, rows in games:
+                cursor.execute(query_game, values)
+                game_ids.append(cursor.lastrowid)
+                cursor.executemany(query_move, [(cursor.lastrowid, move + 1, row) for move, row in enumerate(rows)])
+        # Return the game ids of the records just inserted
+        return game_ids
+
+    def save_game(self, player_one_id, player_two_id, result, board_size, date_played, time_played, num_moves, rows):
+        # Add a finished game and all of its moves at once. Nothing is saved if any part
+        # fails, so a game is never left without its moves. Returns the game id.
+        return self.add_games([(player_one_id, player_two_id, result, board_size, date_played, time_played, num_moves, rows)])[0]
+
+    def get_player_games(self, player=None):
+        self.create_con()
+        # Check if a player name has been given to filter
+        if player:
+            # Get the id of the player
+            id = self.get_player_id(player)
+            # Create query, each side of the OR is found through its player index
+            query = """SELECT game_id, player_one.name as player_one_name, player_two.name as player_two_name, result, board_size, date_played, time_played, num_Moves
+                        FROM game
+                        JOIN player player_one on game.player_one_id = player_one.player_id
+                        JOIN player player_two on game.player_two_id = player_two.player_id
+                        WHERE player_one_id = ? OR player_two_id = ?;"""
+            values = (id, id)
+        else:
+            # Create query
+            query = """SELECT game_id, player_one.name as player_one_name, player_two.name as player_two_name, result, board_size, date_played, time_played, num_Moves
+                        FROM game
+                        JOIN player player_one on game.player_one_id = player_one.player_id
+                        JOIN player player_two on game.player_two_id = player_two.player_id;"""
+            values = ()
+        # Execute query
+        cursor = self.con.cursor()
+        games = cursor.execute(query, values).fetchall()
+        return games
+    
+    def get_games_page(self, player=None, sort=0, descending=False, after=None, limit=100):
+        self.create_con()
+        # Up to limit rows like get_player_games, sorted by GAME_COLUMNS[sort] and then
+        # game id, starting after the row after. Pages carry on from the sort value and
+        # game id of the last row instead of skipping rows, so every page is as quick to
+        # get as the first.
+        column = self.GAME_COLUMNS[sort]
+        direction = "DESC" if descending else "ASC"
+        conditions = []
+        values = []
+        if player:
+            id = self.get_player_id(player)
+            conditions.append("(player_one_id = ? OR player_two_id = ?)")
+            values += [id, id]
+        if after:
+            conditions.append(f"({column}, game_id) {'<' if descending else '>'} (?, ?)")
+            values += [after[sort], after[0]]
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        # Create query, the column names come from GAME_COLUMNS rather than the caller
+        query = f"""SELECT game_id, player_one.name as player_one_name, player_two.name as player_two_name, result, board_size, date_played, time_played, num_Moves
+                    FROM game
+                    JOIN player player_one on game.player_one_id = player_one.player_id
+                    JOIN player player_two on game.player_two_id = player_two.player_id
+                    {where}
+                    ORDER BY {column} {direction}, game_id {direction}
+                    LIMIT ?;"""
+        # Execute query
+        cursor = self.con.cursor()
+        return cursor.execute(query, values + [limit]).fetchall()
+
+    def get_game(self, id):
+        self.create_con()
+        # Create query
+        query = """SELECT * FROM game WHERE game_id = ?;"""
+        # Execute query
+        cursor = self.con.cursor()
+        game = cursor.execute(query, (id,)).fetchall()[0]
+        return game
+
+    def get_moves(self, id):
+        self.create_con()
+        # Create query
+        query = """SELECT position FROM move WHERE game_id = ? ORDER BY move_id ASC;"""
+        # Execute query
+        cursor = self.con.cursor()
+        moves = cursor.execute(query, (id,)).fetchall()
+        return moves
+            
+    def get_number_games(self, id):
+        self.create_con()
+        # Create query
+        query = """SELECT COUNT(*) FROM game WHERE player_one_id = ? OR player_two_id = ?;"""
+        # Execute query
+        cursor = self.con.cursor()
+        num = cursor.execute(query, (id, id)).fetchall()[0][0]
+        return num
+    
+    def get_number_wins(self, id):
+        self.create_con()
+        # Create queries
+        query_one = """SELECT COALESCE(SUM(result=1), 0) FROM game WHERE player_one_id = ?;"""
+        query_two = """SELECT COALESCE(SUM(result=2), 0) FROM game WHERE player_two_id = ?;"""
+        # Execute queries
+        cursor = self.con.cursor()
+        num = cursor.execute(query_one, (id,)).fetchall()[0][0]
+        num += cursor.execute(query_two, (id,)).fetchall()[0][0]
+        return num
+    
+    def get_average_moves(self, id):
+        self.create_con()
+        # Create query
+        query = """SELECT COALESCE(AVG(num_moves), 0) FROM game WHERE player_one_id = ? OR player_two_id = ?;"""
+        # Execute query
+        cursor = self.con.cursor()
+        num = round(cursor.execute(query, (id, id)).fetchall()[0][0])
+        return num
+
+    def migrate_moves(self):
+        self.create_con()
+        # Games saved before moves were stored in binary have the whole board as text
+        # in every row, rewrite them a game at a time
+        cursor = self.con.cursor()
+        query = """SELECT DISTINCT game_id FROM move WHERE typeof(position) = 'text';"""
+        game_ids = [row[0] for row in cursor.execute(query).fetchall()]
+        with self.con:
+            for game_id in game_ids:
+                rows = cursor.execute("""SELECT move_id, position FROM move WHERE game_id = ? ORDER BY move_id;""", (game_id,)).fetchall()
+                positions = []
+                for move_id, row in rows:
+                    positions.append(decode_row(row, positions[-1] if positions else None))
+                values = [(row, game_id, move_id) for (move_id, old), row in zip(rows, encode_positions(positions))]
+                cursor.executemany("""UPDATE move SET position = ? WHERE game_id = ? AND move_id = ?;""", values)
+            # Record the conversion with it, so it only ever runs once
+            cursor.execute(f"""PRAGMA user_version = {self.SCHEMA_VERSION};""")
+        if game_ids:
+            # Give the space the text took back to the file system
+            cursor.execute("VACUUM;")
+        return len(game_ids)
+
+    def get_schema_version(self):
+        self.create_con()
+        # Create query
+        query = """PRAGMA user_version;"""
+        # Execute query
+        cursor = self.con.cursor()
+        return cursor.execute(query).fetchall()[0][0]
+
+    def get_player_stats(self, id, board_size=None, opponent_id=None, summary=True):
+        self.create_con()
+        # (games, wins, average moves) of a player, only counting games on board_size
+        # and against opponent_id if they are given. Read from the player_stats summary
+        # table unless summary is False, then counted from the games in one query.
+        values = {"id": id, "size": board_size, "opponent": opponent_id}
+        if summary:
+            # Create query
+            query = """SELECT COALESCE(SUM(games), 0), COALESCE(SUM(wins), 0), COALESCE(SUM(total_moves), 0)
+                        FROM player_stats
+                        WHERE player_id = :id
+                            AND (:size IS NULL OR board_size = :size)
+                            AND (:opponent IS NULL OR opponent_id = :opponent);"""
+        else:
+            # Create query
+            query = """SELECT COUNT(*),
+                            COALESCE(SUM(player_one_id = :id AND result = 1 OR player_two_id = :id AND result = 2), 0),
+                            COALESCE(SUM(num_moves), 0)
+                        FROM game
+                        WHERE (player_one_id = :id OR player_two_id = :id)
+                            AND (:size IS NULL OR board_size = :size)
+                            AND (:opponent IS NULL OR player_one_id = :opponent AND player_two_id = :id
+                                 OR player_two_id = :opponent AND player_one_id = :id);"""
+        # Execute query
+        cursor = self.con.cursor()
+        games, wins, moves = cursor.execute(query, values).fetchall()[0]
+        return games, wins, round(moves / games) if games else 0
+
+    def get_opponent_names(self, id):
+        self.create_con()
+        # Create query
+        query = """SELECT DISTINCT player.name
+                    FROM player_stats
+                    JOIN player ON player_stats.opponent_id = player.player_id
+                    WHERE player_stats.player_id = ? AND player_stats.games > 0
+                    ORDER BY player.name;"""
+        # Execute query
+        cursor = self.con.cursor()
+        return [x[0] for x in cursor.execute(query, (id,)).fetchall()]
+
+    def create_stats_table(self):
+        self.create_con()
+        # Games, wins and total moves of each player by board size and opponent, kept up
+        # to date by triggers on game so the stats screen never has to count games.
+        # A game against yourself is counted once, and won whichever side won.
+        cursor = self.con.cursor()
+        exists = cursor.execute("""SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'player_stats';""").fetchone()
+        sql_create_stats_table = """ CREATE TABLE IF NOT EXISTS player_stats (
+                                            player_id integer NOT NULL,
+                                            board_size integer NOT NULL,
+                                            opponent_id integer NOT NULL,
+                                            games integer NOT NULL,
+                                            wins integer NOT NULL,
+                                            total_moves integer NOT NULL,
+                                            PRIMARY KEY (player_id, board_size, opponent_id)
+                                        ) WITHOUT ROWID; """
+
+        sql_create_add_trigger = """ CREATE TRIGGER IF NOT EXISTS game_added AFTER INSERT ON game
+                                    BEGIN
+                                        INSERT INTO player_stats
+                                            SELECT NEW.player_one_id, NEW.board_size, NEW.player_two_id, 1,
+                                                NEW.result = 1 OR NEW.player_one_id = NEW.player_two_id AND NEW.result = 2, NEW.num_moves
+                                            WHERE true
+                                            ON CONFLICT (player_id, board_size, opponent_id) DO UPDATE
+                                            SET games = games + 1, wins = wins + excluded.wins, total_moves = total_moves + excluded.total_moves;
+                                        INSERT INTO player_stats
+                                            SELECT NEW.player_two_id, NEW.board_size, NEW.player_one_id, 1, NEW.result = 2, NEW.num_moves
+                                            WHERE NEW.player_one_id != NEW.player_two_id
+                                            ON CONFLICT (player_id, board_size, opponent_id) DO UPDATE
+                                            SET games = games + 1, wins = wins + excluded.wins, total_moves = total_moves + excluded.total_moves;
+                                    END; """
+
+        sql_create_remove_trigger = """ CREATE TRIGGER IF NOT EXISTS game_removed AFTER DELETE ON game
+                                    BEGIN
+                                        UPDATE player_stats
+                                            SET games = games - 1, total_moves = total_moves - OLD.num_moves,
+                                                wins = wins - (OLD.result = 1 OR OLD.player_one_id = OLD.player_two_id AND OLD.result = 2)
+                                            WHERE player_id = OLD.player_one_id AND board_size = OLD.board_size AND opponent_id = OLD.player_two_id;
+                                        UPDATE player_stats
+                                            SET games = games - 1, total_moves = total_moves - OLD.num_moves, wins = wins - (OLD.result = 2)
+                                            WHERE player_id = OLD.player_two_id AND board_size = OLD.board_size AND opponent_id = OLD.player_one_id
+                                                AND OLD.player_one_id != OLD.player_two_id;
+                                    END; """
+
+        self.create_table(sql_create_stats_table)
+        self.create_table(sql_create_add_trigger)
+        self.create_table(sql_create_remove_trigger)
+        # Fill the table from the games saved before it existed
+        if not exists:
+            self.rebuild_stats()
+
+    def rebuild_stats(self):
+        self.create_con()
+        # Count the player_stats table again from every saved game
+        query = """INSERT INTO player_stats
+                    SELECT player_id, board_size, opponent_id, COUNT(*), SUM(win), SUM(num_moves)
+                    FROM (
+                        SELECT player_one_id AS player_id, board_size, player_two_id AS opponent_id,
+                            result = 1 OR player_one_id = player_two_id AND result = 2 AS win, num_moves
+                        FROM game
+                        UNION ALL
+                        SELECT player_two_id, board_size, player_one_id, result = 2, num_moves
+                        FROM game
+                        WHERE player_one_id != player_two_id
+                    )
+                    GROUP BY player_id, board_size, opponent_id;"""
+        # Execute queries, replacing the old counts in one transaction
+        cursor = self.con.cursor()
+        with self.con:
+            cursor.execute("""DELETE FROM player_stats;""")
+            cursor.execute(query)
+
+    def create_indexes(self):
+        # Indexes on each player column of game, holding the columns the statistics
+        # read so those queries never touch the table, and a unique index on player
+        # names which is how players are looked up
+        sql_create_indexes = [
+            """CREATE INDEX IF NOT EXISTS game_player_one ON game (player_one_id, result, num_moves);""",
+            """CREATE INDEX IF NOT EXISTS game_player_two ON game (player_two_id, result, num_moves);""",
+            """CREATE UNIQUE INDEX IF NOT EXISTS player_name ON player (name);""",
+        ]
+        for sql in sql_create_indexes:
+            self.create_table(sql)
+
+    def setup_tables(self):
+        # Create table queries
+        sql_create_game_table = """ CREATE TABLE IF NOT EXISTS game (
+                                            game_id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+                                            player_one_id integer NOT NULL,
+                                            player_two_id integer NOT NULL,
+                                            result integer NOT NULL,
+                                            board_size integer NOT NULL,
+                                            date_played text NOT NULL,
+                                            time_played text NOT NULL,
+                                            num_moves integer NOT NULL
+                                        ); """
+        
+        sql_create_player_table = """ CREATE TABLE IF NOT EXISTS player (
+                                            player_id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+                                            name text NOT NULL,
+                                            active integer NOT NULL,
+                                            ai integer NOT NULL
+                                        ); """
+        
+        sql_create_move_table = """ CREATE TABLE IF NOT EXISTS move (
+                                            game_id integer NOT NULL,
+                                            move_id integer NOT NULL,
+                                            position blob NOT NULL,
+                                            PRIMARY KEY (game_id, move_id)
+                                        ); """
+        
+        sql_create_config_table = """ CREATE TABLE IF NOT EXISTS config (
+                                            config_id integer NOT NULL PRIMARY KEY AUTOINCREMENT,
+                                            board_size integer NOT NULL,
+                                            board_colours text NOT NULL,
+                                            theme text NOT NULL
+                                        ); """
+        
+        # Execute table queries
+        self.create_table(sql_create_game_table)
+        self.create_table(sql_create_player_table)
+        self.create_table(sql_create_move_table)
+        self.create_table(sql_create_config_table)
+        self.create_indexes()
+        self.create_stats_table()
+        if self.get_schema_version() < 1:
+            self.migrate_moves()
+
+        # Add players
+        self.add_player("Guest", False)
+        self.add_player("AI Difficulty 1", True)
+        self.add_player("AI Difficulty 2", True)
+        self.add_player("AI Difficulty 3", True)
+        self.add_player("AI Difficulty 4", True)
+        self.add_player("AI Difficulty 5", True)
+        for level in range(1, 6):
+            self.add_player("MCTS Difficulty " + str(level), True)
+
+        # Add default configuration
+        if not self.configs_exist():
+            self.add_config(10, "Coral", "System")
@@ -0,0 +1,81 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from database import DatabaseManager
+
+# Indexes created by DatabaseManager.create_indexes, dropped to time the queries without them
+INDEXES = ("game_player_one", "game_player_two", "player_name")
+
+
+def build_database(path, games, players, seed=1):
+    # Synthetic archive of games between random pairs of players, without moves
+    generator = random.Random(seed)
+    db = DatabaseManager(path)
+    db.setup_tables()
+    with db.con:
+        db.con.executemany("INSERT OR IGNORE INTO player(name, ai, active) VALUES (?, 0, 1);",
+                           ((f"Player {player}",) for player in range(players)))
+    ids = [row[0] for row in db.con.execute("SELECT player_id FROM player;")]
+
+    def rows():
+        for game in range(games):
+            one, two = generator.sample(ids, 2)
+            yield (one, two, generator.randint(1, 2), generator.choice((8, 10, 12, 16)), "2024-01-01", "12:00:00", generator.randint(40, 300))
+
+    with db.con:
+        db.con.executemany("""INSERT INTO game(player_one_id, player_two_id, result, board_size, date_played, time_played, num_moves)
+                              VALUES (?,?,?,?,?,?,?);""", rows())
+    return db
+
+
+def time_queries(db, names):
+    # Average milliseconds of each per player lookup over the sample of players
+    queries = {
+        "player_exists": lambda name: db.player_exists(name),
+        "get_player_games": lambda name: db.get_player_games(name),
+        "get_number_games": lambda name: db.get_number_games(db.get_player_id(name)),
+        "get_number_wins": lambda name: db.get_number_wins(db.get_player_id(name)),
+        "get_average_moves": lambda name: db.get_average_moves(db.get_player_id(name)),
+        "player stats query": lambda name: db.get_player_stats(db.get_player_id(name), summary=False),
+        "player_stats table": lambda name: db.get_player_stats(db.get_player_id(name)),
+    }
+    timings = {}
+    for query, run in queries.items():
+        start = time.perf_counter()
+        for name in names:
+            run(name)
+        timings[query] = (time.perf_counter() - start) / len(names) * 1000
+    return timings
+
+
+def bench_database(path, games, players, samples):
+    print(f"Building a database of {games} games between {players} players")
+    start = time.perf_counter()
+    db = build_database(path, games, players)
+    print(f"  {time.perf_counter() - start:.1f} s, {os.path.getsize(path) / 1e6:.0f} MB")
+    names = [f"Player {player}" for player in random.Random(2).sample(range(players), samples)]
+    indexed = time_queries(db, names)
+    for index in INDEXES:
+        db.con.execute(f"DROP INDEX {index};")
+    scanned = time_queries(db, names)
+    db.create_indexes()
+    db.close_con()
+    print(f"Per player lookups, average of {samples} players")
+    for query in indexed:
+        print(f"  {query:<18} {scanned[query]:>9.2f} ms without indexes {indexed[query]:>9.2f} ms with  {scanned[query] / indexed[query]:>7.0f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the per player database queries on a large synthetic archive")
+    parser.add_argument("--games", type=int, default=1000000)
+    parser.add_argument("--players", type=int, default=1000)
+    parser.add_argument("--samples", type=int, default=20, help="players to time the lookups of")
+    parser.add_argument("--db", help="file to build the database in, a temporary file that is deleted afterwards by default")
+    args = parser.parse_args()
+    if args.db:
+        bench_database(args.db, args.games, args.players, args.samples)
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            bench_database(os.path.join(directory, "benchmark.db"), args.games, args.players, args.samples)
@@ -0,0 +1,11 @@
+# Halma rules and AI with no GUI dependencies, used by main.py and benchmark.py
+from .board import MIN_SIZE, MAX_SIZE, BoardMasks, Position, get_masks, squares_of
+from .book import OpeningBook, book_path
+from .endgame import EndgameSolver
+from .record import GameRecord, decode_row, encode_positions, move_between
+from .evaluation import DEFAULT_WEIGHTS, FEATURES, Evaluator, evaluate, load_weights, save_weights
+from .control import SearchControl
+from .search import Search, SearchTimeout, TranspositionTable
+from .parallel import ParallelSearch
+from .mcts import MCTS
+from .match import play_game
@@ -0,0 +1,287 @@
+import random
+
+MIN_SIZE = 5
+MAX_SIZE = 16
+# Each camp is the triangle of squares within this many steps of a corner
+CAMP_ROWS = 4
+# (row, col) offsets of the eight directions a piece can move or jump in
+DIRECTIONS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+# Fixed seed so Zobrist keys, and anything saved using them, are the same every run
+ZOBRIST_SEED = 20240304
+
+
+class BoardMasks:
+    # Bitboards and lookup lists that only depend on the size of the board.
+    # Square (row, col) is stored in bit row * size + col.
+
+    def __init__(self, size):
+        self.size = size
+        self.squares = size * size
+        self.full = (1 << self.squares) - 1
+        self.win_score = size * 50
+
+        # Player one starts in the bottom right camp and player two in the top left,
+        # each player's goal is the other player's camp
+        self.camp = [0, 0, 0]
+        # Distance of every square from each player's goal corner
+        self.distance = [None, [0] * self.squares, [0] * self.squares]
+        for row in range(size):
+            for col in range(size):
+                square = row * size + col
+                if (size - 1 - row) + (size - 1 - col) < CAMP_ROWS:
+                    self.camp[1] |= 1 << square
+                if row + col < CAMP_ROWS:
+                    self.camp[2] |= 1 << square
+                self.distance[1][square] = row + col
+                self.distance[2][square] = (size - 1 - row) + (size - 1 - col)
+        self.goal = [0, self.camp[2], self.camp[1]]
+        # Which camp each square is in, 0 for neither, and how many squares each camp has
+        self.camp_of = [0] * self.squares
+        for camp in (1, 2):
+            for square in squares_of(self.camp[camp]):
+                self.camp_of[square] = camp
+        self.camp_size = [0, self.camp[1].bit_count(), self.camp[2].bit_count()]
+
+        # Move tables: for every square the bitboard of squares one step away, and the
+        # (over bit, landing bit, landing square) of every jump that stays on the board
+        self.steps = [0] * self.squares
+        self.jumps = [[] for square in range(self.squares)]
+        for row in range(size):
+            for col in range(size):
+                square = row * size + col
+                for x, y in DIRECTIONS:
+                    if 0 <= row + x < size and 0 <= col + y < size:
+                        self.steps[square] |= 1 << (square + x * size + y)
+                    if 0 <= row + 2 * x < size and 0 <= col + 2 * y < size:
+                        land = square + 2 * (x * size + y)
+                        self.jumps[square].append((1 << (square + x * size + y), 1 << land, land))
+
+        # Zobrist keys: one random 64 bit number per player per square, plus one that
+        # is mixed in when player two is to move
+        generator = random.Random(ZOBRIST_SEED + size)
+        self.zobrist = [None]
+        for player in (1, 2):
+            self.zobrist.append([generator.getrandbits(64) for square in range(self.squares)])
+        self.side_key = generator.getrandbits(64)
+
+
+# Masks and move tables are built the first time each board size is used
+_masks = {}
+
+
+def get_masks(size):
+    if size not in _masks:
+        if not MIN_SIZE <= size <= MAX_SIZE:
+            raise ValueError(f"Board size must be between {MIN_SIZE} and {MAX_SIZE}")
+        _masks[size] = BoardMasks(size)
+    return _masks[size]
+
+
+def squares_of(bitboard):
+    # List the square numbers of every set bit, lowest first
+    squares = []
+    while bitboard:
+        bit = bitboard & -bitboard
+        squares.append(bit.bit_length() - 1)
+        bitboard ^= bit
+    return squares
+
+
+def piece_targets(masks, square, occupied):
+    # Yield the squares the piece on square can reach on a board with the occupied
+    # squares: jump chain landings first, found by a depth first search that visits
+    # each square at most once, then steps
+    jumps = masks.jumps
+    bit = 1 << square
+    # The piece is lifted off its square while it jumps
+    board = occupied ^ bit
+    visited = bit
+    stack = [square]
+    while stack:
+        for over, land, land_square in jumps[stack.pop()]:
+            if over & board and not land & (board | visited):
+                visited |= land
+                stack.append(land_square)
+                yield land_square
+    yield from squares_of(masks.steps[square] & ~board)
+
+
+class Position:
+    # A Halma position stored as one integer bitboard per player.
+    # Moves are (from_square, to_square) tuples.
+
+    def __init__(self, size, ones=0, twos=0):
+        self.size = size
+        self.masks = get_masks(size)
+        # Indexed by player number so pieces[1] and pieces[2] are the two players
+        self.pieces = [0, ones, twos]
+        # Undo records of the moves applied so far, most recent last
+        self.history = []
+        # Zobrist hash of the pieces, kept up to date by apply_move and undo_move
+        self.hash = 0
+        # Distance score as in evaluate, player two's distances minus player one's,
+        # also kept up to date by apply_move and undo_move
+        self.score = 0
+        # Number of pieces of each player, and in camp_count[camp][player] how many of
+        # them are in each camp, with camp 0 counting the rest of the board
+        self.piece_count = [0, ones.bit_count(), twos.bit_count()]
+        self.camp_count = [[0, 0, 0] for camp in range(3)]
+        for player in (1, 2):
+            for square in squares_of(self.pieces[player]):
+                self.hash ^= self.masks.zobrist[player][square]
+                self.camp_count[self.masks.camp_of[square]][player] += 1
+        for square in squares_of(self.pieces[1]):
+            self.score -= self.masks.distance[1][square]
+        for square in squares_of(self.pieces[2]):
+            self.score += self.masks.distance[2][square]
+
+    @classmethod
+    def start(cls, size):
+        masks = get_masks(size)
+        return cls(size, masks.camp[1], masks.camp[2])
+
+    @classmethod
+    def from_board(cls, board):
+        # Convert a list of lists board as used by the GUI
+        size = len(board)
+        pieces = [0, 0, 0]
+        for row in range(size):
+            for col in range(size):
+                if board[row][col]:
+                    pieces[board[row][col]] |= 1 << (row * size + col)
+        return cls(size, pieces[1], pieces[2])
+
+    @classmethod
+    def from_string(cls, text):
+        # Convert a position saved in the move table: rows of digits separated by commas
+        rows = text.split(",")
+        size = len(rows)
+        pieces = [0, 0, 0]
+        for row, line in enumerate(rows):
+            for col, value in enumerate(line):
+                if value != "0":
+                    pieces[int(value)] |= 1 << (row * size + col)
+        return cls(size, pieces[1], pieces[2])
+
+    def to_string(self):
+        # The text from_string reads back
+        return ",".join("".join(str(value) for value in row) for row in self.to_board())
+
+    def to_board(self):
+        board = [[0 for x in range(self.size)] for y in range(self.size)]
+        for player in (1, 2):
+            for square in squares_of(self.pieces[player]):
+                row, col = divmod(square, self.size)
+                board[row][col] = player
+        return board
+
+    def copy(self):
+        return Position(self.size, self.pieces[1], self.pieces[2])
+
+    def square(self, row, col):
+        return row * self.size + col
+
+    def coords(self, square):
+        return divmod(square, self.size)
+
+    def move_coords(self, move):
+        # Convert a move to the (src_row, src_col, dest_row, dest_col) form used by the GUI
+        return self.coords(move[0]) + self.coords(move[1])
+
+    def player_at(self, square):
+        bit = 1 << square
+        if self.pieces[1] & bit:
+            return 1
+        if self.pieces[2] & bit:
+            return 2
+        return 0
+
+    def get_moves(self, player):
+        return list(self.generate_moves(player))
+
+    def generate_moves(self, player):
+        # Yield every distinct (from, to) move of the player exactly once, piece by
+        # piece, so a search that cuts off early never generates the rest
+        for square in squares_of(self.pieces[player]):
+            for target in self.piece_moves(square):
+                yield (square, target)
+
+    def piece_moves(self, square):
+        return piece_targets(self.masks, square, self.pieces[1] | self.pieces[2])
+
+    def is_legal(self, move, player):
+        # Check a move from elsewhere, such as the transposition table, before playing it
+        if not self.pieces[player] >> move[0] & 1:
+            return False
+        for target in self.piece_moves(move[0]):
+            if target == move[1]:
+                return True
+        return False
+
+    def single_moves(self, square, jumping=False, jumped_from=None):
+        # Squares a piece being moved by hand can go to next: a step, unless it is part
+        # way through a chain of jumps, or a single jump that does not go back to
+        # jumped_from, the square the chain started on
+        occupied = self.pieces[1] | self.pieces[2]
+        targets = []
+        for over, land, land_square in self.masks.jumps[square]:
+            if over & occupied and not land & occupied and land_square != jumped_from:
+                targets.append(land_square)
+        if not jumping:
+            targets += squares_of(self.masks.steps[square] & ~occupied)
+        return targets
+
+    def valid_move(self, src, dest, jumping=False, jumped_from=None):
+        # Returns whether the hand move from src to dest is allowed and if it is a jump
+        if dest not in self.single_moves(src, jumping, jumped_from):
+            return False, False
+        return True, not self.masks.steps[src] >> dest & 1
+
+    def key(self, player):
+        # Hash of the position with the given player to move
+        return self.hash if player == 1 else self.hash ^ self.masks.side_key
+
+    def apply_move(self, move):
+        # Move the piece in place and push an undo record so undo_move can reverse it
+        player = 1 if self.pieces[1] >> move[0] & 1 else 2
+        self.pieces[player] ^= (1 << move[0]) | (1 << move[1])
+        zobrist = self.masks.zobrist[player]
+        self.hash ^= zobrist[move[0]] ^ zobrist[move[1]]
+        distance = self.masks.distance[player]
+        if player == 1:
+            self.score -= distance[move[1]] - distance[move[0]]
+        else:
+            self.score += distance[move[1]] - distance[move[0]]
+        camp_of = self.masks.camp_of
+        self.camp_count[camp_of[move[0]]][player] -= 1
+        self.camp_count[camp_of[move[1]]][player] += 1
+        self.history.append((move, player))
+
+    def undo_move(self):
+        # Take back the most recently applied move
+        move, player = self.history.pop()
+        self.pieces[player] ^= (1 << move[0]) | (1 << move[1])
+        zobrist = self.masks.zobrist[player]
+        self.hash ^= zobrist[move[0]] ^ zobrist[move[1]]
+        distance = self.masks.distance[player]
+        if player == 1:
+            self.score += distance[move[1]] - distance[move[0]]
+        else:
+            self.score -= distance[move[1]] - distance[move[0]]
+        camp_of = self.masks.camp_of
+        self.camp_count[camp_of[move[1]]][player] -= 1
+        self.camp_count[camp_of[move[0]]][player] += 1
+
+    def outside_goal(self, player):
+        # How many of the player's pieces still have to get into their goal camp
+        return self.piece_count[player] - self.camp_count[3 - player][player]
+
+    def check_win(self):
+        # A player wins when their goal camp is full and holds at least one of their pieces
+        count = self.camp_count
+        size = self.masks.camp_size
+        if count[1][2] and count[1][1] + count[1][2] == size[1]:
+            return 2
+        if count[2][1] and count[2][1] + count[2][2] == size[2]:
+            return 1
+        return 0
@@ -0,0 +1,75 @@
+import bisect
+import mmap
+import os
+import struct
+
+# Opening books written by make_book.py, one file per board size
+BOOK_DIR = os.path.join(os.path.dirname(__file__), "books")
+
+
+def book_path(size):
+    return os.path.join(BOOK_DIR, f"{size}x{size}.book")
+
+
+class OpeningBook:
+    # Moves to play straight away in known positions. The file is a header followed by
+    # (Zobrist key with the side to move, from square, to square) records sorted by
+    # key, which are found by bisection in the memory mapped file without reading it in.
+    # The header gives the depth the moves were searched to, so the book is only used
+    # by an AI searching to the same depth.
+
+    MAGIC = b"HBOK"
+    VERSION = 2
+    # Magic, version, board size, search depth, number of records
+    HEADER = struct.Struct("<4sHHHI")
+    RECORD = struct.Struct("<QHH")
+
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.size, self.depth, self.count = self.HEADER.unpack_from(self.data)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a version {self.VERSION} opening book")
+
+    @classmethod
+    def load(cls, size):
+        # The book for the board size, or None if there is not one
+        path = book_path(size)
+        return cls(path) if os.path.exists(path) else None
+
+    def close(self):
+        self.data.close()
+
+    def __len__(self):
+        return self.count
+
+    def key_at(self, index):
+        return self.RECORD.unpack_from(self.data, self.HEADER.size + index * self.RECORD.size)[0]
+
+    def probe(self, key):
+        # The move stored for a key, or None
+        index = bisect.bisect_left(range(self.count), key, key=self.key_at)
+        if index < self.count:
+            found, origin, target = self.RECORD.unpack_from(self.data, self.HEADER.size + index * self.RECORD.size)
+            if found == key:
+                return (origin, target)
+        return None
+
+    def lookup(self, position, player):
+        # The book move of the player in the position, checked in case of a key collision
+        if position.size != self.size:
+            return None
+        move = self.probe(position.key(player))
+        if move and position.is_legal(move, player):
+            return move
+        return None
+
+    @classmethod
+    def write(cls, path, size, depth, moves):
+        # Save {key: move}, searched to depth, as a book for the board size
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION, size, depth, len(moves)))
+            for key in sorted(moves):
+                file.write(cls.RECORD.pack(key, *moves[key]))
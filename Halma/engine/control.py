@@ -0,0 +1,50 @@
+import time
+
+
+class SearchControl:
+    # Tells a running search when to give up. The search polls it every few nodes,
+    # so stop() from another thread ends the search within a few milliseconds.
+    # Deadlines are wall clock times so they mean the same in every process.
+
+    def __init__(self, time_limit=None, max_nodes=None):
+        self.time_limit = time_limit
+        self.max_nodes = max_nodes
+        self.deadline = None
+        self.stop_requested = False
+
+    def start(self):
+        # Start the clock for time_limit, called when the search begins. A clock that is
+        # already running is left alone, so work done before the search, like solving
+        # an endgame, comes out of the same time limit.
+        if self.time_limit and self.deadline is None:
+            self.set_deadline(self.time_limit)
+
+    def set_deadline(self, seconds):
+        # Give a search that is already running this many more seconds
+        self.deadline = time.time() + seconds
+
+    def stop(self):
+        self.stop_requested = True
+
+    def stopped(self):
+        return self.stop_requested
+
+    def out_of_time(self):
+        return self.deadline is not None and time.time() >= self.deadline
+
+    def out_of_nodes(self, nodes):
+        return self.max_nodes is not None and nodes >= self.max_nodes
+
+
+class WorkerControl(SearchControl):
+    # Control for a search in a worker process. The parent process stops it by
+    # changing the shared current search number away from this search's number.
+
+    def __init__(self, current, search_id, deadline=None):
+        super().__init__()
+        self.current = current
+        self.search_id = search_id
+        self.deadline = deadline
+
+    def stopped(self):
+        return self.current.value != self.search_id
@@ -0,0 +1,90 @@
+import time
+from .board import piece_targets, squares_of
+
+
+class EndgameSolver:
+    # Finds a short way for a player to finish when only a few of their pieces, the
+    # stragglers, are still outside their goal. Every other piece on the board, the
+    # player's pieces already home included, is taken to stay where it is, so the
+    # answer is the fewest straggler moves that fill the goal camp with the rest held
+    # fixed. That is only a bound on the real race: a shorter line that also moves
+    # pieces already home is never considered, and the opponent's moves can open or
+    # block jumps.
+
+    MAX_STRAGGLERS = 3
+    # Give up on a position after reaching this many arrangements of the stragglers
+    # per square of the board
+    STATES_PER_SQUARE = 400
+    # Share of the time left on the SearchControl the solver may use, so the search
+    # still has time for its move when the solver gives up
+    TIME_SHARE = 0.25
+
+    def __init__(self):
+        # (size, player, fixed pieces, stragglers) -> (moves to finish, next move),
+        # None for positions that could not be solved. The opponent's pieces are part
+        # of the key, so this only saves solving the same position twice, for example
+        # by the analysis panel and the AI or by pondering and the move that follows.
+        self.cache = {}
+        # (size, player, stragglers) that ran out of states. Where the other pieces
+        # stand barely changes how many arrangements there are, so these are not tried
+        # again after every opponent move.
+        self.too_big = set()
+
+    def applies(self, position, player):
+        return 0 < position.outside_goal(player) <= self.MAX_STRAGGLERS and not position.check_win()
+
+    def solve(self, position, player, control=None):
+        # (moves to finish, first move) if the position is an endgame that can be
+        # solved, otherwise None. A SearchControl can stop it part way through, and if
+        # it has a deadline the solver gives up after TIME_SHARE of the time left.
+        if not self.applies(position, player):
+            return None
+        masks = position.masks
+        goal = masks.goal[player]
+        stragglers = position.pieces[player] & ~goal
+        fixed = (position.pieces[1] | position.pieces[2]) ^ stragglers
+        home = position.pieces[player] & goal
+        key = (position.size, player, fixed, stragglers)
+        if key in self.cache:
+            return self.cache[key]
+        if (position.size, player, stragglers) in self.too_big:
+            return None
+        deadline = None
+        if control and control.deadline:
+            deadline = time.time() + (control.deadline - time.time()) * self.TIME_SHARE
+
+        # Breadth first search over the squares the stragglers are on, so the first
+        # arrangement found that fills the goal is one of the fewest moves away
+        parents = {stragglers: None}
+        frontier = [stragglers]
+        max_states = self.STATES_PER_SQUARE * masks.squares
+        while frontier and len(parents) <= max_states:
+            next_frontier = []
+            for state in frontier:
+                if control and (control.stopped() or deadline and time.time() >= deadline):
+                    return None
+                board = fixed | state
+                for square in squares_of(state):
+                    for target in piece_targets(masks, square, board):
+                        new_state = state ^ (1 << square) ^ (1 << target)
+                        if new_state in parents:
+                            continue
+                        parents[new_state] = (state, (square, target))
+                        if (fixed | new_state) & goal == goal and (home | new_state) & goal:
+                            self.cache[key] = self.first_move(parents, new_state)
+                            return self.cache[key]
+                        next_frontier.append(new_state)
+            frontier = next_frontier
+        if frontier:
+            self.too_big.add((position.size, player, stragglers))
+        else:
+            self.cache[key] = None
+        return None
+
+    def first_move(self, parents, state):
+        # (moves to finish, first move) of the line the search found to state
+        moves = 0
+        while parents[state]:
+            state, move = parents[state]
+            moves += 1
+        return moves, move
@@ -0,0 +1,186 @@
+import json
+import os
+from .board import MIN_SIZE, MAX_SIZE
+
+# NumPy is optional, without it moves are scored one at a time in Python
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Terms of the weighted evaluation, each counted from player one's point of view
+FEATURES = ("distance", "stragglers", "jump_lanes", "blocking")
+# Whole number weights of each term for every board size
+DEFAULT_WEIGHTS = {size: [2, 3, 1, 4] for size in range(MIN_SIZE, MAX_SIZE + 1)}
+# Fewest moves worth the cost of converting them to NumPy arrays
+NUMPY_MIN_MOVES = 96
+# Weights written by tune.py, used in place of the defaults when the file exists.
+# The version changes whenever the FEATURES or their meaning change.
+WEIGHTS_FILE = os.path.join(os.path.dirname(__file__), "weights.json")
+WEIGHTS_VERSION = 1
+
+
+def load_weights(path=WEIGHTS_FILE):
+    # Read a weight file as {board size: weights}, raises ValueError if it was written
+    # for a different set of features
+    with open(path) as file:
+        data = json.load(file)
+    if data.get("version") != WEIGHTS_VERSION or data.get("features") != list(FEATURES):
+        raise ValueError(f"{path} is not a version {WEIGHTS_VERSION} weight file")
+    return {int(size): [int(weight) for weight in weights] for size, weights in data["weights"].items()}
+
+
+def save_weights(weights, path=WEIGHTS_FILE, **info):
+    # Write {board size: weights} with any extra information about where they came from
+    data = {"version": WEIGHTS_VERSION, "features": list(FEATURES), **info,
+            "weights": {str(size): [int(weight) for weight in weights[size]] for size in sorted(weights)}}
+    with open(path, "w") as file:
+        json.dump(data, file, indent=2)
+
+
+def evaluate(position):
+    # Score a position from player one's point of view: the win score for a win,
+    # otherwise how much further player two's pieces are from their goal than player
+    # one's, which the position keeps up to date as pieces move
+    win = position.check_win()
+    if win == 1:
+        return position.masks.win_score
+    elif win == 2:
+        return -position.masks.win_score
+    return position.score
+
+
+class EvaluationTables:
+    # Lookup tables of the weighted evaluation for one board size and set of weights
+
+    def __init__(self, masks, weights):
+        size = masks.size
+        self.weights = weights
+        # Squares on each player's own side of the board, where pieces count as stragglers
+        self.back = [0, 0, 0]
+        for square in range(masks.squares):
+            for player in (1, 2):
+                if masks.distance[player][square] >= size:
+                    self.back[player] |= 1 << square
+        # Home camp of each player, pieces still there sit in the opponent's goal
+        self.home = [0, masks.camp[1], masks.camp[2]]
+
+        # Jump lanes: (shift, squares a jump that far towards the goal stays on the board)
+        # for each of the three directions a player's pieces move forward in
+        self.lanes = [None, [], []]
+        for row_step, col_step in ((1, 0), (0, 1), (1, 1)):
+            shift = row_step * size + col_step
+            forward = [0, 0, 0]
+            for row in range(size):
+                for col in range(size):
+                    square = row * size + col
+                    if row >= 2 * row_step and col >= 2 * col_step:
+                        forward[1] |= 1 << square
+                    if row < size - 2 * row_step and col < size - 2 * col_step:
+                        forward[2] |= 1 << square
+            self.lanes[1].append((shift, forward[1]))
+            self.lanes[2].append((shift, forward[2]))
+
+        # Everything but the jump lanes is a sum over pieces, so it folds into one
+        # piece square table per player, signed from player one's point of view
+        distance, stragglers, lanes, blocking = weights
+        self.square_value = [None]
+        for player in (1, 2):
+            sign = -1 if player == 1 else 1
+            values = []
+            for square in range(masks.squares):
+                value = distance * masks.distance[player][square]
+                value += stragglers * (self.back[player] >> square & 1)
+                value += blocking * (self.home[player] >> square & 1)
+                values.append(sign * value)
+            self.square_value.append(values)
+        if numpy:
+            self.square_array = [None] + [numpy.array(values) for values in self.square_value[1:]]
+
+
+class Evaluator:
+    # Weighted sum of the FEATURES with a table of weights per board size. Called like
+    # evaluate, and scores every move of a position at once for move ordering.
+
+    def __init__(self, weights=None):
+        # weights maps board sizes to lists of weights, missing sizes use the defaults.
+        # Without any the tuned weights are loaded from WEIGHTS_FILE if there is one.
+        if weights is None and os.path.exists(WEIGHTS_FILE):
+            weights = load_weights()
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights:
+            self.weights.update(weights)
+        self._tables = {}
+
+    def tables(self, masks):
+        if masks.size not in self._tables:
+            self._tables[masks.size] = EvaluationTables(masks, self.weights[masks.size])
+        return self._tables[masks.size]
+
+    def features(self, position):
+        # Value of each of the FEATURES, positive when it favours player one
+        tables = self.tables(position.masks)
+        pieces = position.pieces
+        count = position.camp_count
+        return [
+            position.score,
+            (pieces[2] & tables.back[2]).bit_count() - (pieces[1] & tables.back[1]).bit_count(),
+            self.jump_lanes(position, 1) - self.jump_lanes(position, 2),
+            count[2][2] - count[1][1],
+        ]
+
+    def jump_lanes(self, position, player):
+        # Pieces that can jump forward along a row, column or diagonal right away
+        occupied = position.pieces[1] | position.pieces[2]
+        empty = ~occupied
+        total = 0
+        for shift, forward in self.tables(position.masks).lanes[player]:
+            if player == 1:
+                total += (position.pieces[1] & forward & occupied << shift & empty << 2 * shift).bit_count()
+            else:
+                total += (position.pieces[2] & forward & occupied >> shift & empty >> 2 * shift).bit_count()
+        return total
+
+    def __call__(self, position):
+        win = position.check_win()
+        if win == 1:
+            return position.masks.win_score
+        elif win == 2:
+            return -position.masks.win_score
+        return self.clamp(position, self.raw_score(position))
+
+    def raw_score(self, position):
+        return sum(weight * value for weight, value in zip(self.tables(position.masks).weights, self.features(position)))
+
+    def clamp(self, position, score):
+        # Keep scores that are not wins below the win score
+        limit = position.masks.win_score - 1
+        return max(-limit, min(limit, score))
+
+    def score_moves(self, position, moves):
+        # Estimated score after each move, all of one player's moves. A move changes
+        # the piece square part of the score by the value of its destination less the
+        # value of its origin; the jump lanes are taken to stay as they are.
+        if not moves:
+            return []
+        tables = self.tables(position.masks)
+        player = 1 if position.pieces[1] >> moves[0][0] & 1 else 2
+        base = self.raw_score(position)
+        limit = position.masks.win_score - 1
+        if numpy and len(moves) >= NUMPY_MIN_MOVES:
+            origins, targets = numpy.array(moves).T
+            values = tables.square_array[player]
+            scores = numpy.clip(base + values[targets] - values[origins], -limit, limit).tolist()
+        else:
+            values = tables.square_value[player]
+            scores = [max(-limit, min(limit, base + values[target] - values[origin])) for origin, target in moves]
+
+        # Only a move into the goal camp can win
+        goal = position.masks.goal[player]
+        for index, move in enumerate(moves):
+            if goal >> move[1] & 1:
+                position.apply_move(move)
+                if position.check_win():
+                    scores[index] = position.masks.win_score if player == 1 else -position.masks.win_score
+                position.undo_move()
+        return scores
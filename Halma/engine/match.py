@@ -0,0 +1,38 @@
+import random
+import time
+from .board import Position
+from .control import SearchControl
+
+
+def play_game(players, size, max_plies=400, random_plies=0, seed=None):
+    # Play a game from the start position between {player: (engine, depth, seconds a
+    # move)}, used by benchmark.py and tournament.py. The first random_plies moves are
+    # random so games between the same engines differ. Returns (winner, whether the
+    # game was won, every position, {player: [nodes, moves, seconds, CPU seconds]}).
+    # A game still going after max_plies goes to the player with less distance left
+    # to cover, or neither if they are level.
+    generator = random.Random(seed)
+    position = Position.start(size)
+    positions = [position.copy()]
+    stats = {1: [0, 0, 0.0, 0.0], 2: [0, 0, 0.0, 0.0]}
+    player = 1
+    for ply in range(max_plies):
+        if position.check_win():
+            break
+        if ply < random_plies:
+            move = generator.choice(position.get_moves(player))
+        else:
+            engine, depth, time_limit = players[player]
+            start = time.perf_counter()
+            cpu = time.process_time()
+            move = engine.iterative_deepening(position, player == 1, depth, SearchControl(time_limit))[1]
+            stats[player][0] += engine.nodes
+            stats[player][1] += 1
+            stats[player][2] += time.perf_counter() - start
+            stats[player][3] += time.process_time() - cpu
+        position.apply_move(move)
+        positions.append(position.copy())
+        player = 3 - player
+    if position.check_win():
+        return position.check_win(), True, positions, stats
+    return (1 if position.score > 0 else 2 if position.score < 0 else 0), False, positions, stats
@@ -0,0 +1,247 @@
+import math
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from .board import Position
+from .evaluation import Evaluator
+
+# MCTS object of a worker process, only used to score leaves
+_worker = None
+
+
+def _start_worker(evaluate, rollout):
+    global _worker
+    _worker = MCTS(evaluate, rollout, seed=os.getpid())
+
+
+def _leaf_values(size, leaves):
+    # Runs in a worker: player one's chance of winning from each (ones, twos, player)
+    return [_worker.leaf_value(Position(size, ones, twos), player) for ones, twos, player in leaves]
+
+
+class Node:
+    # One position of the search tree, reached by move from its parent
+
+    __slots__ = ("move", "player", "children", "untried", "visits", "wins", "result")
+
+    def __init__(self, move, player, result=0):
+        self.move = move
+        # Player to move in the position
+        self.player = player
+        self.children = []
+        # Moves not expanded yet, best last, generated on the first visit
+        self.untried = None
+        self.visits = 0
+        # Sum of the results for the player who made move, so wins / visits is how
+        # good the move looks to the player choosing it
+        self.wins = 0.0
+        # Winner if the position is won, otherwise 0
+        self.result = result
+
+
+class MCTS:
+    # Monte Carlo tree search with UCT. Leaves are scored by the evaluation turned
+    # into a chance of winning, after a short heuristic rollout if rollout is set.
+    # Has the interface of Search so the GUI and benchmark can use either.
+
+    # Exploration constant of UCT
+    EXPLORATION = 0.7
+    # Progressive widening: a node has at most this many children per square root of
+    # its visits, expanded best first, so the hundreds of moves of a Halma position
+    # do not each need a visit before the good ones are looked at again
+    WIDENING = 1.5
+    # An evaluation of this fraction of the win score counts as three chances in four
+    # of winning
+    VALUE_FRACTION = 0.05
+    # Playouts per step of max_depth, so difficulty levels mean the same for both
+    ITERATIONS = 1000
+    # Playouts between checks of the SearchControl and calls of the callback
+    CHECK_INTERVAL = 16
+    REPORT_INTERVAL = 500
+    # Rollouts play one of this many best moves by static score at random
+    ROLLOUT_CHOICES = 3
+    # Leaves sent to each worker at once when scoring leaves in parallel
+    WORKER_BATCH = 8
+
+    def __init__(self, evaluate=None, rollout=0, workers=1, seed=None):
+        # rollout is how many plies to play out before scoring a leaf, and workers the
+        # number of processes scoring leaves. Worker processes only pay for their
+        # messages when rollouts make each leaf expensive.
+        self.evaluate = evaluate or Evaluator()
+        self.rollout = rollout
+        self.workers = workers
+        self.random = random.Random(seed)
+        self.nodes = 0
+        self.pool = None
+        # Root of the last search and a copy of its position, kept so the next search
+        # can carry on from the subtree of the moves played since
+        self.root = None
+        self.root_position = None
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def best_move(self, position, depth, max_player):
+        result = self.iterative_deepening(position, max_player, depth)
+        return result[0], result[1]
+
+    def iterative_deepening(self, position, max_player, max_depth, control=None, callback=None, start_depth=1):
+        # Same interface as Search.iterative_deepening: runs max_depth * ITERATIONS
+        # playouts, or until the SearchControl ends the search, and returns (evaluation,
+        # best move, length of the principal variation). Limits only count once a root
+        # move has been visited. callback(evaluation, best move, depth) is called every
+        # REPORT_INTERVAL playouts.
+        if control:
+            control.start()
+        if self.workers > 1 and not self.pool:
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context(),
+                                            initializer=_start_worker, initargs=(self.evaluate, self.rollout))
+        player = 1 if max_player else 2
+        root = self.find_root(position, player)
+        self.nodes = 0
+        batch = self.workers * self.WORKER_BATCH if self.pool else 1
+        playouts = max_depth * self.ITERATIONS
+        done = 0
+        while done < playouts and not position.check_win():
+            if control and done % self.CHECK_INTERVAL < batch:
+                if control.stopped() or (root.children and (control.out_of_time() or control.out_of_nodes(self.nodes))):
+                    break
+            self.playouts(position, root, min(batch, playouts - done))
+            done += batch
+            if callback and done % self.REPORT_INTERVAL < batch:
+                callback(*self.result(position, root))
+        self.root = root
+        self.root_position = position.copy()
+        if not root.children:
+            return None
+        return self.result(position, root)
+
+    def find_root(self, position, player):
+        # The node of the last search's tree for the position, found among the moves
+        # of the root and the replies to them, or a new tree if it is not there
+        if self.root and self.root_position.size == position.size:
+            candidates = [(self.root, ())]
+            for child in self.root.children:
+                candidates.append((child, (child.move,)))
+                candidates += [(grandchild, (child.move, grandchild.move)) for grandchild in child.children]
+            for node, moves in candidates:
+                for move in moves:
+                    self.root_position.apply_move(move)
+                same = self.root_position.pieces == position.pieces
+                for move in moves:
+                    self.root_position.undo_move()
+                if same and node.player == player:
+                    return node
+        return Node(None, player, position.check_win())
+
+    def playouts(self, position, root, count):
+        # Select count leaves and score them together. Each selection counts as a
+        # loss until it is scored, so the leaves of one batch spread over the tree.
+        paths = []
+        leaves = []
+        for index in range(count):
+            path = self.select(position, root)
+            for node in path:
+                node.visits += 1
+            leaf = path[-1]
+            if leaf.result:
+                paths.append((path, 1.0 if leaf.result == 1 else 0.0))
+            else:
+                paths.append((path, None))
+                leaves.append((position.pieces[1], position.pieces[2], leaf.player))
+            for node in path[1:]:
+                position.undo_move()
+        values = iter(self.leaf_values(position.size, leaves))
+        for path, value in paths:
+            if value is None:
+                value = next(values)
+            for node in path:
+                node.wins += value if node.player == 2 else 1 - value
+        self.nodes += count
+
+    def select(self, position, root):
+        # Walk down by UCT to a node that can grow, add its best untried move and return
+        # the path, leaving position at the end of it for the caller to undo
+        path = [root]
+        node = root
+        while not node.result:
+            if node.untried is None:
+                node.untried = self.ordered_moves(position, node.player)
+            if node.untried and len(node.children) < self.WIDENING * math.sqrt(node.visits + 1):
+                move = node.untried.pop()
+                position.apply_move(move)
+                child = Node(move, 3 - node.player, position.check_win())
+                node.children.append(child)
+                path.append(child)
+                return path
+            if not node.children:
+                return path
+            log_visits = math.log(node.visits + 1)
+            node = max(node.children, key=lambda child: child.wins / (child.visits or 1) +
+                       self.EXPLORATION * math.sqrt(log_visits / (child.visits or 1)))
+            position.apply_move(node.move)
+            path.append(node)
+        return path
+
+    def ordered_moves(self, position, player):
+        # The player's moves worst first by static score
+        moves = list(position.generate_moves(player))
+        scores = self.static_scores(position, moves)
+        return [move for score, move in sorted(zip(scores, moves), reverse=player == 2)]
+
+    def static_scores(self, position, moves):
+        if hasattr(self.evaluate, "score_moves"):
+            return self.evaluate.score_moves(position, moves)
+        scores = []
+        for move in moves:
+            position.apply_move(move)
+            scores.append(self.evaluate(position))
+            position.undo_move()
+        return scores
+
+    def leaf_values(self, size, leaves):
+        # Score the leaves here, or split them between the worker processes
+        if not self.pool or len(leaves) <= 1:
+            return [self.leaf_value(Position(size, ones, twos), player) for ones, twos, player in leaves]
+        chunk = math.ceil(len(leaves) / self.workers)
+        chunks = [leaves[start:start + chunk] for start in range(0, len(leaves), chunk)]
+        return [value for values in self.pool.map(_leaf_values, [size] * len(chunks), chunks) for value in values]
+
+    def leaf_value(self, position, player):
+        # Player one's chance of winning from the position with the player to move,
+        # after playing the rollout
+        for ply in range(self.rollout):
+            if position.check_win():
+                break
+            moves = self.ordered_moves(position, player)
+            position.apply_move(self.random.choice(moves[-self.ROLLOUT_CHOICES:]))
+            player = 3 - player
+        return self.win_chance(position, self.evaluate(position))
+
+    def win_chance(self, position, eval):
+        win_score = position.masks.win_score
+        if abs(eval) >= win_score:
+            return 1.0 if eval > 0 else 0.0
+        return 1 / (1 + math.exp(-math.log(3) * eval / (self.VALUE_FRACTION * win_score)))
+
+    def result(self, position, root):
+        # (evaluation, most visited move, length of the principal variation). The win
+        # chance of the move is turned back into an evaluation, or the win score if it wins.
+        best = max(root.children, key=lambda child: child.visits)
+        win_score = position.masks.win_score
+        if best.result:
+            eval = win_score if best.result == 1 else -win_score
+        else:
+            chance = best.wins / best.visits if best.player == 2 else 1 - best.wins / best.visits
+            chance = min(max(chance, 1e-9), 1 - 1e-9)
+            eval = self.VALUE_FRACTION * win_score * math.log(chance / (1 - chance)) / math.log(3)
+            eval = max(1 - win_score, min(win_score - 1, round(eval)))
+        depth = 0
+        node = root
+        while node.children:
+            node = max(node.children, key=lambda child: child.visits)
+            depth += 1
+        return eval, best.move, depth
@@ -0,0 +1,154 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from .board import Position
+from .control import WorkerControl
+from .evaluation import Evaluator
+from .search import Search, SearchTimeout
+
+# Search object of a worker process, kept between tasks so its table stays warm,
+# and the number of the search the parent process currently wants results for
+_worker = None
+_current = None
+
+
+def _start_worker(table_mb, evaluate, current, options):
+    global _worker, _current
+    _worker = Search(table_mb, evaluate, **options)
+    _current = current
+
+
+def _search_move(size, ones, twos, move, depth, max_player, search_id, alpha, beta):
+    # Runs in a worker: score one root move within the window alpha to beta, giving
+    # up as soon as the parent moves on from search number search_id
+    if _current.value != search_id:
+        return None, 0
+    control = WorkerControl(_current, search_id)
+    try:
+        eval = _worker.search_move(Position(size, ones, twos), move, depth, max_player, control, alpha, beta)
+    except SearchTimeout:
+        return None, _worker.nodes
+    return eval, _worker.nodes
+
+
+class ParallelSearch:
+    # Root parallel search: the first root move is searched with a full window, then
+    # the rest at once by a pool of worker processes with a null window around its
+    # score, and any not shown to be worse are searched again. The best is picked in the order
+    # the serial search tries them, so at equal depth it returns the same evaluation
+    # and move as Search as long as late move reductions and futility pruning are off.
+
+    # Seconds between checks of the SearchControl while waiting for workers
+    STOP_POLL = 0.01
+
+    def __init__(self, workers=None, table_mb=16, evaluate=None, **options):
+        # options are the pruning switches of the workers' Search objects
+        self.workers = workers or os.cpu_count() or 1
+        self.table_mb = table_mb
+        self.evaluate = evaluate or Evaluator()
+        self.options = options
+        self.nodes = 0
+        # Only used to order root moves, which needs no table
+        self.orderer = Search(0, evaluate)
+        self.pool = None
+        self.current = None
+
+    def start(self):
+        # The pool is started once and reused for every search until close
+        if not self.pool:
+            context = multiprocessing.get_context()
+            # Shared with the workers, changing it stops every move still being searched
+            self.current = context.RawValue("i", 0)
+            self.pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_start_worker,
+                                            initargs=(self.table_mb, self.evaluate, self.current, self.options))
+
+    def close(self):
+        if self.pool:
+            self.current.value += 1
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    def best_move(self, position, depth, max_player):
+        result = self.iterative_deepening(position, max_player, depth, start_depth=depth)
+        return result[0], result[1]
+
+    def iterative_deepening(self, position, max_player, max_depth, control=None, callback=None, start_depth=1):
+        # Same interface and result as Search.iterative_deepening
+        self.start()
+        start = time.time()
+        if control:
+            control.start()
+        self.nodes = 0
+        result = None
+        for depth in range(start_depth, max_depth + 1):
+            first_moves = (result[1],) if result else ()
+            # Time and node limits only apply once there is a move to play
+            root = self.search_root(position, depth, max_player, control, first_moves, result is not None)
+            if root is None:
+                break
+            result = root + (depth,)
+            if callback:
+                callback(result[0], result[1], depth)
+            if abs(result[0]) >= position.masks.win_score:
+                break
+            if control and control.deadline and time.time() - start > (control.deadline - start) / 2:
+                break
+        return result
+
+    def search_root(self, position, depth, max_player, control=None, first_moves=(), limits=True):
+        # Returns (evaluation, best move), or None if the control stopped the search
+        # first, in which case the workers drop the moves they are still searching
+        if depth <= 0 or position.check_win():
+            return self.evaluate(position), None
+        moves = self.orderer.root_moves(position, depth, max_player, first_moves)
+        self.current.value += 1
+        search_id = self.current.value
+        futures = []
+
+        def submit(move, alpha, beta):
+            future = self.pool.submit(_search_move, position.size, position.pieces[1], position.pieces[2], move, depth, max_player, search_id, alpha, beta)
+            futures.append(future)
+            return future
+
+        try:
+            best_eval = self.result(submit(moves[0], -math.inf, math.inf), control, limits)
+            best_move = moves[0]
+            if best_eval is None:
+                return None
+            # The other moves only have to be shown to be no better than the first
+            window = (best_eval, best_eval + 1) if max_player else (best_eval - 1, best_eval)
+            rest = [(move, submit(move, *window)) for move in moves[1:]]
+            for move, future in rest:
+                eval = self.result(future, control, limits)
+                # Only a score outside the null window it was searched with proves the
+                # move no better than the first. The best may have risen since, so a
+                # bound equal to it can still hide a better move.
+                if eval is not None and (eval > window[0] if max_player else eval < window[1]):
+                    # It may beat the best so far, search it again for its exact score.
+                    # Strict comparison so ties go to the earliest move, like the serial search.
+                    research = (best_eval, math.inf) if max_player else (-math.inf, best_eval)
+                    eval = self.result(submit(move, *research), control, limits)
+                    if eval is not None and (eval > best_eval if max_player else eval < best_eval):
+                        best_eval = eval
+                        best_move = move
+                if eval is None:
+                    return None
+            return best_eval, best_move
+        finally:
+            # Stop any worker still on this search and drop the moves not started yet
+            self.current.value += 1
+            for future in futures:
+                future.cancel()
+
+    def result(self, future, control, limits):
+        # Score a worker found, or None if it or the control stopped first. Waits in
+        # short slices so a stop request or the deadline is noticed quickly.
+        while control and not future.done():
+            if control.stopped() or (limits and (control.out_of_time() or control.out_of_nodes(self.nodes))):
+                return None
+            wait([future], timeout=self.STOP_POLL)
+        eval, nodes = future.result()
+        self.nodes += nodes
+        return eval
@@ -0,0 +1,97 @@
+from .board import Position, squares_of
+
+# Saved games have one row in the move table per position. A row is either a keyframe,
+# a byte giving the board size followed by the board packed two bits a square, or
+# just the two squares of the move from the position before it. Keyframes are written
+# for the first position, every KEYFRAME_INTERVAL positions after it so any position
+# can be rebuilt quickly, and wherever two positions are not one move apart.
+KEYFRAME_INTERVAL = 32
+
+
+def move_between(before, after):
+    # The (player, move) that turns one position into the next, or None if they are
+    # not one move apart
+    for player in (1, 2):
+        changed = before.pieces[player] ^ after.pieces[player]
+        if changed and before.pieces[3 - player] == after.pieces[3 - player]:
+            origin = before.pieces[player] & changed
+            target = after.pieces[player] & changed
+            if origin.bit_count() == 1 and target.bit_count() == 1:
+                return player, (origin.bit_length() - 1, target.bit_length() - 1)
+    return None
+
+
+def encode_board(position):
+    packed = 0
+    for player in (1, 2):
+        for square in squares_of(position.pieces[player]):
+            packed |= player << 2 * square
+    return bytes([position.size]) + packed.to_bytes((position.size * position.size + 3) // 4, "little")
+
+
+def decode_board(data):
+    size = data[0]
+    packed = int.from_bytes(data[1:], "little")
+    pieces = [0, 0, 0]
+    for square in range(size * size):
+        player = packed >> 2 * square & 3
+        if player:
+            pieces[player] |= 1 << square
+    return Position(size, pieces[1], pieces[2])
+
+
+def encode_positions(positions):
+    # Rows to save for a game's positions in order
+    rows = []
+    for index, position in enumerate(positions):
+        played = move_between(positions[index - 1], position) if index % KEYFRAME_INTERVAL else None
+        rows.append(bytes(played[1]) if played else encode_board(position))
+    return rows
+
+
+def decode_row(data, previous=None):
+    # Position stored in a row given the one before it. Rows saved before the binary
+    # format are board text, which from_string still reads.
+    if isinstance(data, str):
+        return Position.from_string(data)
+    if len(data) == 2:
+        position = previous.copy()
+        position.apply_move((data[0], data[1]))
+        return position
+    return decode_board(data)
+
+
+class GameRecord:
+    # The positions of a saved game, rebuilt from its rows only when they are asked
+    # for. Indexing gives boards as used by the GUI so a record can stand in for a list
+    # of them; stepping through the game in order only applies one move each time.
+
+    def __init__(self, rows):
+        self.rows = rows
+        # Index and Position of the last position rebuilt
+        self.last = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.position(index).to_board()
+
+    def position(self, index):
+        if index < 0:
+            index += len(self.rows)
+        if not 0 <= index < len(self.rows):
+            raise IndexError("game record index out of range")
+        # Start from the keyframe at or before the index, or the last position rebuilt
+        # if that is closer
+        start = index
+        while start and len(self.rows[start]) == 2:
+            start -= 1
+        if self.last and start <= self.last[0] <= index:
+            start, position = self.last
+        else:
+            position = decode_row(self.rows[start])
+        for row in range(start + 1, index + 1):
+            position = decode_row(self.rows[row], position)
+        self.last = (index, position)
+        return position.copy()
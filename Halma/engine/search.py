@@ -0,0 +1,357 @@
+import math
+import time
+from .evaluation import Evaluator
+
+# Bound types stored in the transposition table
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+
+class TranspositionTable:
+    # Fixed size hash table of search results, indexed by the low bits of the
+    # Zobrist key. Each slot holds (depth, bound, score, best move, generation).
+
+    # Rough memory used by one slot: the key, the entry tuple and its contents
+    ENTRY_BYTES = 160
+
+    def __init__(self, size_mb=16):
+        # Largest power of two number of slots that fits in the memory budget
+        slots = max(1, int(size_mb * 1024 * 1024) // self.ENTRY_BYTES)
+        self.size = 1 << (slots.bit_length() - 1)
+        self.mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.entries = [None] * self.size
+        self.generation = 0
+
+    def new_search(self):
+        # Entries from earlier searches become the first to be replaced
+        self.generation += 1
+
+    def probe(self, key):
+        index = key & self.mask
+        if self.keys[index] == key:
+            return self.entries[index]
+        return None
+
+    def store(self, key, depth, bound, score, move):
+        index = key & self.mask
+        entry = self.entries[index]
+        # Replace empty slots, the same position, results from an earlier search,
+        # or results searched no deeper than this one
+        if entry is None or self.keys[index] == key or entry[4] != self.generation or depth >= entry[0]:
+            self.keys[index] = key
+            self.entries[index] = (depth, bound, score, move, self.generation)
+
+
+class SearchTimeout(Exception):
+    # Raised inside the search when it is stopped or its time or node budget runs out
+    pass
+
+
+class Search:
+    # Alpha-beta minimax over a single Position that is changed in place with
+    # apply_move and put back with undo_move, so no boards are copied per node
+
+    # How many nodes are searched between checks of the stop flag and the clock
+    CHECK_INTERVAL = 16
+    # Late move reductions: from this depth on, moves after the first LMR_MOVES are
+    # searched one ply shallower unless they turn out to raise alpha
+    LMR_DEPTH = 3
+    LMR_MOVES = 4
+    # Futility pruning at this depth and below, with a margin of this much per ply
+    FUTILITY_DEPTH = 2
+    FUTILITY_MARGIN = 10
+
+    def __init__(self, table_mb=16, evaluate=None, pvs=True, lmr=True, futility=False):
+        # Function scoring a position from player one's point of view, the weighted
+        # Evaluator unless another is given
+        self.evaluate = evaluate or Evaluator()
+        # Switches for principal variation search, late move reductions and futility
+        # pruning. With all three off every move is searched to full depth.
+        self.pvs = pvs
+        self.lmr = lmr
+        self.futility = futility
+        self.nodes = 0
+        # SearchControl of the running search, and whether its time and node limits
+        # apply yet
+        self.control = None
+        self.limits = False
+        # Principal variation of the last completed iteration, and whether the
+        # current node is still on it
+        self.pv = []
+        self.follow_pv = False
+        # Killer moves of each ply and history scores of each (from, to) move, both
+        # raised by moves that cause a cutoff and kept for the whole search
+        self.killers = []
+        self.history = []
+        # Static score of each move generated at each ply, used by futility pruning
+        self.static = []
+        # A budget of 0 turns the transposition table off
+        self.table = TranspositionTable(table_mb) if table_mb else None
+
+    def best_move(self, position, depth, max_player):
+        # Search the position to the given depth, returns (evaluation, best move)
+        result = self.iterative_deepening(position, max_player, depth, start_depth=depth)
+        return result[0], result[1]
+
+    def iterative_deepening(self, position, max_player, max_depth, control=None, callback=None, start_depth=1):
+        # Search at depth start_depth, start_depth + 1, ... up to max_depth, each
+        # iteration trying the previous principal variation first, and return
+        # (evaluation, best move, depth) of the deepest completed iteration.
+        # The search ends early when the SearchControl runs out of time or nodes,
+        # which only counts once the first iteration is done, or is stopped, which
+        # can happen at any point so the result may be None.
+        # callback(evaluation, best move, depth) is called after every iteration.
+        start = time.time()
+        self.control = control
+        if control:
+            control.start()
+        root = len(position.history)
+        self.nodes = 0
+        self.pv = []
+        self.clear_ordering(position, max_depth)
+        result = None
+        if self.table:
+            self.table.new_search()
+
+        for depth in range(start_depth, max_depth + 1):
+            self.limits = result is not None
+            self.root = root
+            self.pv_table = [[] for ply in range(depth + 2)]
+            self.follow_pv = True
+            try:
+                eval, move = self.minimax(position, depth, -math.inf, math.inf, max_player)
+            except SearchTimeout:
+                # Take back the moves of the unfinished iteration
+                while len(position.history) > root:
+                    position.undo_move()
+                break
+            result = (eval, move, depth)
+            self.pv = self.pv_table[0]
+            if callback:
+                callback(eval, move, depth)
+
+            # No point searching deeper once a win is found, or starting an iteration
+            # that is unlikely to finish in the time left
+            if abs(eval) >= position.masks.win_score:
+                break
+            if control and control.deadline and time.time() - start > (control.deadline - start) / 2:
+                break
+        self.control = None
+        return result
+
+    def root_moves(self, position, depth, max_player, first_moves=()):
+        # Root moves in the order a search to depth would try them
+        return list(self.ordered_moves(position, max_player, first_moves))
+
+    def search_move(self, position, move, depth, max_player, control=None, alpha=-math.inf, beta=math.inf):
+        # Score of playing move at the root, searched to depth, exact when it is between
+        # alpha and beta. Used to search root moves separately, for example in worker
+        # processes.
+        self.nodes = 0
+        self.root = len(position.history)
+        self.pv = []
+        self.pv_table = [[] for ply in range(depth + 2)]
+        self.follow_pv = False
+        self.clear_ordering(position, depth)
+        self.control = control
+        self.limits = True
+        if self.table:
+            self.table.new_search()
+        position.apply_move(move)
+        try:
+            return self.minimax(position, depth - 1, alpha, beta, not max_player)[0]
+        finally:
+            self.control = None
+            while len(position.history) > self.root:
+                position.undo_move()
+
+    def clear_ordering(self, position, max_depth):
+        self.killers = [[None, None] for ply in range(max_depth + 2)]
+        self.history = [0] * (position.masks.squares * position.masks.squares)
+        self.static = [{} for ply in range(max_depth + 2)]
+
+    def record_cutoff(self, position, move, ply, depth):
+        # Remember a move that refuted the position, deeper searches count for more
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        self.history[move[0] * position.masks.squares + move[1]] += depth * depth
+
+    def search_child(self, position, depth, alpha, beta, max_player, searched):
+        # Score of a child of a node searched to depth, where max_player is the side to
+        # move in the child and searched is how many of its siblings came before it
+        if not searched:
+            return self.minimax(position, depth - 1, alpha, beta, max_player)[0]
+        # Later moves only have to be shown to be no better than the best so far, which
+        # a null window around alpha (beta for the minimising player) does cheaply
+        if not self.pvs:
+            window = (alpha, beta)
+        elif max_player:
+            window = (beta - 1, beta)
+        else:
+            window = (alpha, alpha + 1)
+        if self.lmr and depth >= self.LMR_DEPTH and searched >= self.LMR_MOVES:
+            eval = self.minimax(position, depth - 2, window[0], window[1], max_player)[0]
+            if (eval >= beta) if max_player else (eval <= alpha):
+                return eval
+        eval = self.minimax(position, depth - 1, window[0], window[1], max_player)[0]
+        if window == (alpha, beta) or ((eval >= beta) if max_player else (eval <= alpha)):
+            return eval
+        # It beat the best so far, search it again to get its exact score
+        return self.minimax(position, depth - 1, alpha, beta, max_player)[0]
+
+    def check_limits(self):
+        control = self.control
+        if control is None:
+            return None
+        if self.limits and control.out_of_nodes(self.nodes):
+            raise SearchTimeout()
+        if self.nodes % self.CHECK_INTERVAL == 0:
+            if control.stopped() or (self.limits and control.out_of_time()):
+                raise SearchTimeout()
+
+    def minimax(self, position, depth, alpha, beta, max_player):
+        self.nodes += 1
+        self.check_limits()
+        ply = len(position.history) - self.root
+        self.pv_table[ply] = []
+        if depth <= 0 or position.check_win():
+            return self.evaluate(position), None
+
+        # Use a stored result if it was searched deep enough, otherwise just its move
+        hash_move = None
+        if self.table:
+            key = position.key(1 if max_player else 2)
+            entry = self.table.probe(key)
+            if entry:
+                hash_move = entry[3]
+                if entry[0] >= depth:
+                    if entry[1] == EXACT:
+                        alpha = beta = entry[2]
+                    elif entry[1] == LOWER:
+                        alpha = max(alpha, entry[2])
+                    else:
+                        beta = min(beta, entry[2])
+                    if beta <= alpha:
+                        self.pv_table[ply] = [hash_move] if hash_move else []
+                        return entry[2], hash_move
+        alpha_orig, beta_orig = alpha, beta
+
+        # Follow the previous iteration's principal variation while it is still legal
+        player = 1 if max_player else 2
+        pv_move = None
+        if self.follow_pv:
+            if ply < len(self.pv) and position.is_legal(self.pv[ply], player):
+                pv_move = self.pv[ply]
+            else:
+                self.follow_pv = False
+        # Futility pruning: close to the leaves, moves whose static score is too far
+        # below alpha (above beta for the minimising player) to catch up are skipped
+        margin = None
+        if self.futility and ply and depth <= self.FUTILITY_DEPTH:
+            margin = self.FUTILITY_MARGIN * depth
+        valid_moves = self.ordered_moves(position, max_player, (pv_move, hash_move), ply)
+        best_move = None
+        searched = 0
+
+        if max_player:
+            best_eval = -math.inf
+            for move in valid_moves:
+                if margin is not None and searched and self.static[ply].get(move, math.inf) + margin <= alpha:
+                    best_eval = max(best_eval, self.static[ply][move] + margin)
+                    continue
+                position.apply_move(move)
+                # Use of recursive algorithms here
+                eval = self.search_child(position, depth, alpha, beta, False, searched)
+                position.undo_move()
+                searched += 1
+                self.follow_pv = False
+                if eval > best_eval:
+                    best_eval = eval
+                    best_move = move
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+
+                # Alpha-beta pruning
+                alpha = max(alpha, eval)
+                if beta <= alpha:
+                    self.record_cutoff(position, move, ply, depth)
+                    break
+        else:
+            best_eval = math.inf
+            for move in valid_moves:
+                if margin is not None and searched and self.static[ply].get(move, -math.inf) - margin >= beta:
+                    best_eval = min(best_eval, self.static[ply][move] - margin)
+                    continue
+                position.apply_move(move)
+                # Use of recursive algorithms here
+                eval = self.search_child(position, depth, alpha, beta, True, searched)
+                position.undo_move()
+                searched += 1
+                self.follow_pv = False
+                if eval < best_eval:
+                    best_eval = eval
+                    best_move = move
+                    self.pv_table[ply] = [move] + self.pv_table[ply + 1]
+
+                # Alpha-beta pruning
+                beta = min(beta, eval)
+                if beta <= alpha:
+                    self.record_cutoff(position, move, ply, depth)
+                    break
+
+        if self.table:
+            if best_eval <= alpha_orig:
+                bound = UPPER
+            elif best_eval >= beta_orig:
+                bound = LOWER
+            else:
+                bound = EXACT
+            self.table.store(key, depth, bound, best_eval, best_move)
+        return (best_eval, best_move)
+
+    def ordered_moves(self, position, max_player, first_moves, ply=0):
+        # Yield the principal variation and hash moves, then below the root the killer
+        # moves of this ply, before generating any others, so a cutoff on one of them
+        # saves the cost of move generation. The root keeps the static order so every
+        # search tries root moves in the same order.
+        player = 1 if max_player else 2
+        if self.static:
+            self.static[ply] = {}
+        if ply:
+            first_moves = tuple(first_moves) + tuple(self.killers[ply])
+        tried = []
+        for move in first_moves:
+            if move and move not in tried and position.is_legal(move, player):
+                tried.append(move)
+                yield move
+
+        moves = list(position.generate_moves(player))
+        if hasattr(self.evaluate, "score_moves"):
+            scores = self.evaluate.score_moves(position, moves)
+        else:
+            scores = self.static_scores(position, moves)
+        if self.static:
+            self.static[ply] = dict(zip(moves, scores))
+        # Static order, then below the root by history score with the static order
+        # only breaking ties
+        moves = [combo[1] for combo in sorted(zip(scores, moves), reverse=max_player) if combo[1] not in tried]
+        if ply:
+            history = self.history
+            squares = position.masks.squares
+            moves.sort(key=lambda move: history[move[0] * squares + move[1]], reverse=True)
+        yield from moves
+
+    def static_scores(self, position, moves):
+        # Score after each move for evaluators that cannot score them all in one go
+        scores = []
+        for move in moves:
+            position.apply_move(move)
+            scores.append(self.evaluate(position))
+            position.undo_move()
+        return scores
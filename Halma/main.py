@@ -1,12 +1,73 @@
 import copy
+import queue
 import threading
 import customtkinter as ctk
 from CTkMessagebox import CTkMessagebox
-import math
 from PIL import Image, ImageTk
-from module import DatabaseManager, MultiColumnListbox
+from database import DatabaseManager
+from module import MultiColumnListbox
+from engine import MAX_SIZE, MIN_SIZE, MCTS, EndgameSolver, GameRecord, OpeningBook, ParallelSearch, Position, Search, SearchControl, encode_positions, squares_of
 from datetime import datetime
-import ctypes
+import os
+
+
+class AIJob:
+    # Runs a search in a background thread so the window keeps responding. The
+    # result is handed to a callback, on the search thread, once it finishes.
+
+    def __init__(self, search, position, max_player, depth, time_limit=None, on_done=None, endgame=None):
+        self.search = search
+        self.endgame = endgame
+        self.position = position
+        # Copy of the pieces searched from, the search moves pieces in position about
+        self.pieces = list(position.pieces)
+        self.max_player = max_player
+        self.depth = depth
+        self.on_done = on_done
+        self.result = None
+        self.done = False
+        self.cancelled = False
+        self.control = SearchControl(time_limit)
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        # Endgames the solver can finish are played from its solution without searching.
+        # The clock starts first so the solver's time comes out of the time limit.
+        self.control.start()
+        finish = self.endgame.solve(self.position, 1 if self.max_player else 2, self.control) if self.endgame else None
+        if finish:
+            result = (self.search.evaluate(self.position), finish[1], finish[0])
+        else:
+            result = self.search.iterative_deepening(self.position, self.max_player, self.depth, self.control, callback=self.record)
+        with self.lock:
+            self.result = result or self.result
+            self.done = True
+            on_done = self.on_done
+        if on_done and not self.cancelled:
+            on_done(self)
+
+    def record(self, eval, move, depth):
+        # Keep the deepest completed result in case the search is stopped
+        self.result = (eval, move, depth)
+
+    def deliver_to(self, on_done, time_limit):
+        # Hand the result to on_done, stopping the search after time_limit seconds if it
+        # is still running. Used when the AI was already thinking about this position.
+        with self.lock:
+            if not self.done:
+                self.on_done = on_done
+                self.control.set_deadline(time_limit)
+                return
+        on_done(self)
+
+    def cancel(self):
+        # Stop the search and wait for the thread, its result is thrown away
+        self.cancelled = True
+        self.control.stop()
+        self.thread.join()
+
     
 class HalmaGame:
     def __init__(self, root):
@@ -21,6 +82,22 @@ class HalmaGame:
         self.db = DatabaseManager("halma.db")
         self.db.setup_tables()
 
+        # AI search engine, and the analysis search running in the background
+        self.search = Search()
+        # Monte Carlo tree search the AI can use in place of minimax, it keeps its tree
+        # from one move to the next
+        self.mcts = MCTS()
+        # Opening book of each board size, loaded when first needed, and the solver for
+        # endgames with only a few pieces left to bring home
+        self.books = {}
+        self.endgame = EndgameSolver()
+        self.process = None
+        self.analysis_control = None
+
+        # Callbacks posted by background threads, run on the Tk main thread
+        self.events = queue.Queue()
+        self.EVENT_POLL = 20
+
         # Set options        
         # Colour codes taken from https://omgchess.blogspot.com/2015/09/chess-board-color-schemes.html
         self.board_colour_options = {
@@ -39,6 +116,16 @@ class HalmaGame:
         self.BEST_MOVE_COLOUR = "grey"
         self.BUTTON_HEIGHT = 25
         self.BUTTON_WIDTH = 50
+        # Seconds the AI may think for before playing its best move so far
+        self.AI_TIME_LIMIT = 2
+        self.MAX_ANALYSIS_DEPTH = 20
+        # Processes the AI spreads its root moves over, 1 searches in this process.
+        # Reductions are off so it plays the move the serial search would at each depth.
+        self.AI_WORKERS = os.cpu_count() or 1
+        if self.AI_WORKERS > 1:
+            self.ai_search = ParallelSearch(self.AI_WORKERS, lmr=False, futility=False)
+        else:
+            self.ai_search = self.search
         self.player_one = ctk.StringVar()
         self.player_two = ctk.StringVar()
         self.board_colours = ctk.StringVar()
@@ -70,6 +157,7 @@ class HalmaGame:
         self.side_panel.grid(row=0, column=1, padx=20, sticky="w")
 
         self.set_menu()
+        self.poll_events()
 
     def open_images(self):
         # Open the piece images using PILLOW
@@ -92,37 +180,20 @@ class HalmaGame:
         self.show_move = 0
         self.in_play = True
         self.analysing = False
+        # Background searches for the AI's move and for pondering on the opponent's time
+        self.ai_job = None
+        self.ponder_job = None
 
         self.reset_board()
         self.move_history.append(copy.deepcopy(self.board))
     
     def reset_board(self):
-        self.player_one_positions = [
-            (self.grid_size.get() - 1, self.grid_size.get() - 1),
-
-            (self.grid_size.get() - 1, self.grid_size.get() - 2), (self.grid_size.get() - 2, self.grid_size.get() - 1),
+        start = Position.start(self.grid_size.get())
+        # Squares of each camp, highlighted on the board
+        self.player_one_positions = [start.coords(square) for square in squares_of(start.masks.camp[1])]
+        self.player_two_positions = [start.coords(square) for square in squares_of(start.masks.camp[2])]
 
-            (self.grid_size.get() - 1, self.grid_size.get() - 3), (self.grid_size.get() - 2, self.grid_size.get() - 2), 
-            (self.grid_size.get() - 3, self.grid_size.get() - 1),
-
-            (self.grid_size.get() - 1, self.grid_size.get() - 4), (self.grid_size.get() - 2, self.grid_size.get() - 3), 
-            (self.grid_size.get() - 3, self.grid_size.get() - 2), (self.grid_size.get() - 4, self.grid_size.get() - 1),
-        ]
-
-        self.player_two_positions = [
-            (0, 0),
-            (0, 1), (1, 0),
-            (0, 2), (1, 1), (2, 0),
-            (0, 3), (1, 2), (2, 1), (3, 0),
-        ]
-        
-        self.board = [[0 for x in range(self.grid_size.get())] for y in range(self.grid_size.get())]
-
-        for row, col in self.player_one_positions:
-            self.board[row][col] = 1
-
-        for row, col in self.player_two_positions:
-            self.board[row][col] = 2
+        self.board = start.to_board()
         
         self.draw_board()
 
@@ -161,7 +232,7 @@ class HalmaGame:
         self.end_button.grid(row=1, column=3)
 
         self.info_string = ctk.StringVar()
-        self.info_string.set(self.player_names[self.current_player - 1].get() + "'s Turn")
+        self.info_string.set(self.turn_text())
         info_text = ctk.CTkLabel(self.side_panel, textvariable=self.info_string, anchor="nw", bg_color="red")
         info_text.grid(row=2, columnspan=4, sticky="new")
 
@@ -230,16 +301,21 @@ class HalmaGame:
         difficulty = ctk.CTkSlider(self.side_panel, from_=1, to=5, number_of_steps=4, variable=self.depth)
         difficulty.grid(row=3)
 
+        self.engine_name = ctk.StringVar()
+        self.engine_name.set("Minimax")
+        engine = ctk.CTkSegmentedButton(self.side_panel, values=["Minimax", "MCTS"], variable=self.engine_name)
+        engine.grid(row=4)
+
         state = ctk.StringVar()
         state.set("on")
         start_switch = ctk.CTkSwitch(self.side_panel, text="Make first move", command=self.switcher, variable=state, onvalue="on", offvalue="off")
-        start_switch.grid(row=4)
+        start_switch.grid(row=5)
 
         submit_button = ctk.CTkButton(self.side_panel, height=self.BUTTON_HEIGHT, width=self.BUTTON_WIDTH, text="Start Game", command=self.submit)
-        submit_button.grid(row=5)
+        submit_button.grid(row=6)
 
         back_button = ctk.CTkButton(self.side_panel, height=self.BUTTON_HEIGHT, width=self.BUTTON_WIDTH, text="Back", command=self.set_menu)
-        back_button.grid(row=6)
+        back_button.grid(row=7)
 
     def switcher(self):
         self.player_one, self.player_two = self.player_two, self.player_one
@@ -269,10 +345,11 @@ class HalmaGame:
 
     def submit(self):
         # Set AI Name
+        ai_name = "MCTS" if self.use_mcts() else "AI"
         if not self.player_one.get():
-            self.player_one.set("AI Difficulty " + str(self.depth.get()))
+            self.player_one.set(ai_name + " Difficulty " + str(self.depth.get()))
         if not self.player_two.get():
-            self.player_two.set("AI Difficulty " + str(self.depth.get()))
+            self.player_two.set(ai_name + " Difficulty " + str(self.depth.get()))
 
         self.player_names = [self.player_one, self.player_two]
         self.set_game()
@@ -306,13 +383,8 @@ class HalmaGame:
         self.player_one.set(self.db.get_player_name(game[1]))
         self.player_two.set(self.db.get_player_name(game[2]))
         self.change_board_size(game[4])
-        self.move_history = []
-        for move in moves:
-            move = move[0].split(",")
-            move_arr = []
-            for row in move:
-                move_arr.append([int(x) for x in list(row)])
-            self.move_history.append(copy.deepcopy(move_arr))
+        # Boards are only rebuilt from the saved moves when they are shown
+        self.move_history = GameRecord([move[0] for move in moves])
         self.num_moves = game[7]
 
     def set_analysis_panel(self):
@@ -350,27 +422,52 @@ class HalmaGame:
         self.set_in_play()
 
     def view_best_move(self):
-        self.depth = ctk.IntVar()
-        self.depth.set(1)
         self.best_move_button.grid_forget()
         self.eval.set("Evaluation:")
         self.eval_label.grid(row=2, columnspan=4, sticky="new")
-        self.process = threading.Thread(target=self.improve_eval, daemon=True)
+        self.analysis_position = Position.from_board(self.move_history[self.show_move])
+        self.analysis_control = SearchControl()
+        self.process = threading.Thread(target=self.improve_eval, args=(self.analysis_position, self.show_move % 2 == 0, self.analysis_control), daemon=True)
         self.process.start()
 
-    def improve_eval(self):
-        while self.depth.get() < 20:
-            eval, best_move = self.minimax(copy.deepcopy(self.move_history[self.show_move]), self.depth.get(), -math.inf, math.inf, self.show_move % 2 == 0)
-            self.eval.set(f'Evaluation: {eval:.2f} (Depth {self.depth.get()})')
-            if best_move:
-                self.best_move = [(best_move[0], best_move[1]), (best_move[2], best_move[3])]
-            self.depth.set(self.depth.get() + 1)
-            self.draw_board()
+    def improve_eval(self, position, max_player, control):
+        # Runs on the analysis thread until the control is stopped
+        finish = self.endgame.solve(position, 1 if max_player else 2, control)
+        if finish:
+            self.events.put((self.show_finish, (control, finish[0], finish[1])))
+            return None
+        self.search.iterative_deepening(position, max_player, self.MAX_ANALYSIS_DEPTH, control, callback=lambda *result: self.events.put((self.show_eval, (control,) + result)))
+
+    def show_eval(self, control, eval, best_move, depth):
+        # Called each time the search completes a deeper iteration, results of a
+        # cancelled analysis may still be waiting in the queue
+        if control is not self.analysis_control or control.stopped():
+            return None
+        self.eval.set(f'Evaluation: {eval:.2f} (Depth {depth})')
+        if best_move:
+            self.best_move = [self.analysis_position.coords(best_move[0]), self.analysis_position.coords(best_move[1])]
+        self.draw_board()
+
+    def show_finish(self, control, moves, best_move):
+        # Called with the solution of an endgame instead of search results
+        if control is not self.analysis_control or control.stopped():
+            return None
+        self.eval.set(f'Finishes in {moves} move{"s" if moves > 1 else ""}')
+        self.best_move = [self.analysis_position.coords(best_move[0]), self.analysis_position.coords(best_move[1])]
+        self.draw_board()
+
+    def cancel_analysis(self):
+        # Stop the analysis search and wait for it, returns whether one was running
+        if not self.process:
+            return False
+        self.analysis_control.stop()
+        self.process.join()
+        self.process = None
+        return True
 
     def stop_analysis(self):
         self.best_move = []
-        if self.process:
-            self.terminate_thread(self.process)
+        self.cancel_analysis()
         self.set_game()
         self.reset_board()
         self.set_menu()
@@ -461,6 +558,10 @@ class HalmaGame:
 
         players = self.db.get_player_names()
         self.stats_player = ctk.StringVar()
+        self.stats_size = ctk.StringVar()
+        self.stats_size.set("All")
+        self.stats_opponent = ctk.StringVar()
+        self.stats_opponent.set("All")
         self.number_games = ctk.StringVar()
         self.number_wins = ctk.StringVar()
         self.average_moves = ctk.StringVar()
@@ -473,30 +574,52 @@ class HalmaGame:
         stats_options = ctk.CTkOptionMenu(master=self.side_panel, height=self.BUTTON_HEIGHT, width=self.BUTTON_WIDTH*4, values=players, variable=self.stats_player, command=self.get_stats)
         stats_options.grid(row=1, columnspan=2)
 
+        # Only count games on one board size or against one opponent
+        size_label = ctk.CTkLabel(self.side_panel, text="Board Size:")
+        size_label.grid(row=2)
+        sizes = ["All"] + [str(size) for size in range(MIN_SIZE, MAX_SIZE + 1)]
+        size_options = ctk.CTkOptionMenu(master=self.side_panel, height=self.BUTTON_HEIGHT, width=self.BUTTON_WIDTH*2, values=sizes, variable=self.stats_size, command=self.get_stats)
+        size_options.grid(row=2, column=1)
+        opponent_label = ctk.CTkLabel(self.side_panel, text="Opponent:")
+        opponent_label.grid(row=3)
+        self.opponent_options = ctk.CTkOptionMenu(master=self.side_panel, height=self.BUTTON_HEIGHT, width=self.BUTTON_WIDTH*2, values=["All"], variable=self.stats_opponent, command=self.get_stats)
+        self.opponent_options.grid(row=3, column=1)
+
         # Number of games played
         games_played_label = ctk.CTkLabel(self.side_panel, text="Number of Games Played:")
-        games_played_label.grid(row=2)
+        games_played_label.grid(row=4)
         games_played = ctk.CTkLabel(self.side_panel, textvariable=self.number_games)
-        games_played.grid(row=2, column=1)
+        games_played.grid(row=4, column=1)
         # Number of wins
         wins_label = ctk.CTkLabel(self.side_panel, text="Number of Wins:")
-        wins_label.grid(row=3)
+        wins_label.grid(row=5)
         wins = ctk.CTkLabel(self.side_panel, textvariable=self.number_wins)
-        wins.grid(row=3, column=1)
+        wins.grid(row=5, column=1)
         # Average number of moves
         average_label = ctk.CTkLabel(self.side_panel, text="Average Moves:")
-        average_label.grid(row=4)
+        average_label.grid(row=6)
         average = ctk.CTkLabel(self.side_panel, textvariable=self.average_moves)
-        average.grid(row=4, column=1)
+        average.grid(row=6, column=1)
 
         back_button = ctk.CTkButton(self.side_panel, height=self.BUTTON_HEIGHT, width=self.BUTTON_WIDTH, text="Back", command=self.manage_players)
-        back_button.grid(row=5, columnspan=2)
+        back_button.grid(row=7, columnspan=2)
         
-    def get_stats(self, player_name):
-        id = self.db.get_player_id(player_name)
-        self.number_games.set(str(self.db.get_number_games(id)))
-        self.number_wins.set(str(self.db.get_number_wins(id)))
-        self.average_moves.set(str(self.db.get_average_moves(id)))
+    def get_stats(self, choice=None):
+        # Called when any of the option menus changes, shows the chosen player's stats
+        # on the chosen board size against the chosen opponent
+        if not self.stats_player.get():
+            return None
+        id = self.db.get_player_id(self.stats_player.get())
+        opponents = ["All"] + self.db.get_opponent_names(id)
+        self.opponent_options.configure(values=opponents)
+        if self.stats_opponent.get() not in opponents:
+            self.stats_opponent.set("All")
+        board_size = None if self.stats_size.get() == "All" else int(self.stats_size.get())
+        opponent_id = None if self.stats_opponent.get() == "All" else self.db.get_player_id(self.stats_opponent.get())
+        games, wins, average_moves = self.db.get_player_stats(id, board_size, opponent_id)
+        self.number_games.set(str(games))
+        self.number_wins.set(str(wins))
+        self.average_moves.set(str(average_moves))
 
     def settings(self):
         self.clear_side_panel()
@@ -575,6 +698,9 @@ class HalmaGame:
     
     def on_left_click(self, event):
         row, col = event.y // self.cell_size, event.x // self.cell_size
+        # Ignore clicks while the AI is thinking
+        if self.current_player == self.ai_player:
+            return None
         if row < self.grid_size.get() and col < self.grid_size.get() and self.in_play:
             if self.board[row][col] == self.current_player and not self.jumping:
                 self.select_piece(row, col)
@@ -590,13 +716,14 @@ class HalmaGame:
         self.draw_board()
 
     def show_valid_moves(self, position, row, col):
-        moves = []
-        for x in range(-2, 3):
-            for y in range(-2, 3):
-                if 0 <= (row + x) < self.grid_size.get() and 0 <= (col + y) < self.grid_size.get():
-                    if self.valid_move(position, row, col, row + x, col + y)[0]:
-                        moves.append((row + x, col + y))
-        return moves
+        position = Position.from_board(position)
+        targets = position.single_moves(position.square(row, col), self.jumping, self.jumped_square(position))
+        return [position.coords(square) for square in targets]
+
+    def jumped_square(self, position):
+        if self.jumped_from:
+            return position.square(self.jumped_from[0], self.jumped_from[1])
+        return None
     
     def move_piece(self, row, col):
         prev_row, prev_col = self.selected_piece
@@ -621,23 +748,8 @@ class HalmaGame:
             self.draw_board()
     
     def valid_move(self, position, src_row, src_col, dest_row, dest_col):
-        vector = (dest_row - src_row, dest_col - src_col)
-        jump = False
-        # Check if move
-        valid = False
-        if (vector[0] == 0 or abs(vector[0]) == 1) and (vector[1] == 0 or abs(vector[1]) == 1) \
-            and not self.jumping:
-            valid = True
-        # Check if jump
-        elif (vector[0] == 0 or abs(vector[0]) == 2) and (vector[1] == 0 or abs(vector[1]) == 2) \
-            and position[src_row + vector[0] // 2][src_col + vector[1] // 2] != 0 \
-                and (dest_row, dest_col) != self.jumped_from:
-            valid = True
-            jump = True
-        # Check if there is a piece in destination square
-        if position[dest_row][dest_col] != 0:
-            valid = False
-        return valid, jump
+        position = Position.from_board(position)
+        return position.valid_move(position.square(src_row, src_col), position.square(dest_row, dest_col), self.jumping, self.jumped_square(position))
     
     def switch_player(self):
         # Deselect any pieces
@@ -654,146 +766,122 @@ class HalmaGame:
         # Update board to show any moves
         self.draw_board()
         self.set_in_play()
-        if self.check_win(self.board):
+        if Position.from_board(self.board).check_win():
             self.game_over()
             return None
         
         self.current_player = 3 - self.current_player
-        self.info_string.set(self.player_names[self.current_player - 1].get() + "'s Turn")
+        self.info_string.set(self.turn_text())
 
         # Allow the UI to update before potential AI turn
         self.side_panel.update_idletasks()
         if self.current_player == self.ai_player:
             self.ai_turn()
 
+    def turn_text(self):
+        # Whose turn it is and how many of their pieces are still outside their goal
+        left = Position.from_board(self.board).outside_goal(self.current_player)
+        return f"{self.player_names[self.current_player - 1].get()}'s Turn ({left} to go)"
+
     def ai_turn(self):
-        best_move = self.minimax(copy.deepcopy(self.board), self.depth.get(), -math.inf, math.inf, self.current_player == 1)[1]
+        position = Position.from_board(self.board)
+        ponder_job = self.ponder_job
+        self.ponder_job = None
+        book_move = self.book_move(position)
+        if book_move:
+            # Known opening position, play the book move without searching
+            if ponder_job:
+                ponder_job.cancel()
+            self.play_move(position.move_coords(book_move))
+        elif ponder_job and ponder_job.pieces == position.pieces:
+            # The opponent played the expected move, carry on with that search
+            self.ai_job = ponder_job
+            ponder_job.deliver_to(self.ai_done, self.AI_TIME_LIMIT)
+        else:
+            if ponder_job:
+                ponder_job.cancel()
+            search = self.mcts if self.use_mcts() else self.ai_search
+            self.ai_job = AIJob(search, position, self.current_player == 1, self.depth.get(), self.AI_TIME_LIMIT, self.ai_done, self.endgame)
+
+    def use_mcts(self):
+        # Whether the AI of this game plays with tree search instead of minimax
+        return self.ai_player != 0 and self.engine_name.get() == "MCTS"
+
+    def ai_done(self, job):
+        # Called on the search thread, the move is played on the Tk main thread
+        self.events.put((self.play_ai_move, (job,)))
+
+    def poll_events(self):
+        # Run the callbacks background threads have posted, Tk may only be used from
+        # the main thread
+        while True:
+            try:
+                callback, args = self.events.get_nowait()
+            except queue.Empty:
+                break
+            callback(*args)
+        self.root.after(self.EVENT_POLL, self.poll_events)
+
+    def play_ai_move(self, job):
+        # Ignore searches that were cancelled while their result was on its way
+        if job is not self.ai_job:
+            return None
+        self.ai_job = None
+        if job.result is None:
+            # Stopped before finishing a single iteration, search again properly
+            self.ai_turn()
+            return None
+        self.play_move(job.position.move_coords(job.result[1]))
 
+    def play_move(self, best_move):
+        # Play the AI's move and think about the next one while the player decides
         self.last_move = (best_move[2], best_move[3])
         self.apply_move(self.board, best_move)
         self.switch_player()
+        if self.playing:
+            self.start_ponder()
+
+    def book_move(self, position):
+        # The opening book move for the AI in the position, if there is one. Book moves
+        # are minimax moves at the depth the book was built at, so other difficulties
+        # and MCTS always search.
+        if self.use_mcts():
+            return None
+        if position.size not in self.books:
+            self.books[position.size] = OpeningBook.load(position.size)
+        book = self.books[position.size]
+        if not book or book.depth != self.depth.get():
+            return None
+        return book.lookup(position, self.current_player)
+
+    def start_ponder(self):
+        # Guess the opponent's reply with a quick search and think about the position
+        # it leads to while they decide, with the engine the AI moves with so a hit
+        # plays the same move as searching afresh would
+        position = Position.from_board(self.board)
+        guess = self.search.best_move(position, 1, self.current_player == 1)[1]
+        if guess is None:
+            return None
+        position.apply_move(guess)
+        search = self.mcts if self.use_mcts() else self.ai_search
+        self.ponder_job = AIJob(search, position, self.current_player != 1, self.depth.get(), endgame=self.endgame)
+
+    def cancel_ai(self):
+        # Stop any background searches, returns whether the AI was choosing a move
+        thinking = self.ai_job is not None
+        for job in (self.ai_job, self.ponder_job):
+            if job:
+                job.cancel()
+        self.ai_job = None
+        self.ponder_job = None
+        return thinking
 
-    def minimax(self, position, depth, alpha, beta, max_player):
-        if depth <= 0 or self.check_win(position):
-            return self.evaluate(position), None
-        valid_moves = self.get_valid_moves(position, max_player)
-        valid_moves = self.sort_moves(position, valid_moves, max_player)
-
-        # Cut down moves to be analysed
-        cutoff = max(int(len(valid_moves) // (self.depth.get()**(self.depth.get()/2))) + 1, 3)
-        valid_moves = valid_moves[:cutoff]
-        best_move = None
-
-        if max_player:
-            max_eval = -math.inf
-            for move in valid_moves:
-                new_pos = self.apply_move(copy.deepcopy(position), move)
-                # Use of recursive algorithms here
-                eval = self.minimax(new_pos, depth - 1, alpha, beta, False)[0]
-                if eval > max_eval:
-                    max_eval = eval
-                    best_move = move
-
-                # Alpha-beta pruning
-                alpha = max(alpha, eval)
-                if beta <= alpha:
-                    break
-            return (max_eval, best_move)
-        else:
-            min_eval = math.inf
-            for move in valid_moves:
-                new_pos = self.apply_move(copy.deepcopy(position), move)
-                # Use of recursive algorithms here
-                eval = self.minimax(new_pos, depth - 1, alpha, beta, True)[0]
-                if eval < min_eval:
-                    min_eval = eval
-                    best_move = move
-
-                # Alpha-beta pruning
-                beta = min(beta, eval)
-                if beta <= alpha:
-                    break
-            return (min_eval, best_move)
-        
-    def sort_moves(self, position, valid_moves, max_player):
-        eval_move = sorted([(self.evaluate(self.apply_move(copy.deepcopy(position), move)), move) for move in valid_moves])
-        if max_player:
-            eval_move = eval_move[::-1]
-        return [combo[1] for combo in eval_move]
-
-    def evaluate(self, position):
-        win = self.check_win(position)
-        if win == 1:
-            return self.grid_size.get() * 50
-        elif win == 2:
-            return - self.grid_size.get() * 50
-        score = 0
-        for i in range(self.grid_size.get()):
-            for j in range(self.grid_size.get()):
-                if position[i][j] == 1:
-                    score -= (i + j)
-                elif position[i][j] == 2:
-                    score += ((self.grid_size.get() - 1 - i) + (self.grid_size.get() - 1 - j))
-        return score
-    
-    def get_valid_moves(self, position, max_player):
-        moves = []
-        jumps = []
-        player = 1 if max_player else 2
-        for row in range(self.grid_size.get()):
-            for col in range(self.grid_size.get()):
-                if position[row][col] == player:
-                    for x in range(-2, 3):
-                        for y in range(-2, 3):
-                            if 0 <= (row + x) < self.grid_size.get() and 0 <= (col + y) < self.grid_size.get():
-                                valid, jumping = self.valid_move(position, row, col, row + x, col + y)
-                                if valid:
-                                    if jumping:
-                                        jumps.append((row, col, row + x, col + y))
-                                    else:
-                                        moves.append((row, col, row + x, col + y))
-        changed = True
-        while changed:
-            changed = False
-            new = []
-            for jump in jumps:
-                new_pos = self.apply_move(copy.deepcopy(position), jump)
-                for x in range(-2, 3, 2):
-                    for y in range(-2, 3, 2):
-                        if 0 <= (jump[2] + x) < self.grid_size.get() and 0 <= (jump[3] + y) < self.grid_size.get() and not (jump[0] == jump[2] + x and jump[1] == jump[3] + y):
-                            if (jump[0], jump[1], jump[2] + x, jump[3] + y) not in jumps and self.valid_move(new_pos, jump[2], jump[3], jump[2] + x, jump[3] + y)[0]:
-                                    new.append((jump[0], jump[1], jump[2] + x, jump[3] + y))
-                                    changed = True
-            jumps = new + jumps
-        return jumps + moves
-    
     def apply_move(self, position, move):
         player = position[move[0]][move[1]]
         position[move[0]][move[1]] = 0
         position[move[2]][move[3]] = player
         return position
     
-    def check_win(self, position):
-        win = True
-        enemy = False
-        for coords in self.player_one_positions:
-            if position[coords[0]][coords[1]] == 0:
-                win = False
-            elif position[coords[0]][coords[1]] == 2:
-                enemy = True
-        if win and enemy:
-            return 2
-        win = True
-        enemy = False
-        for coords in self.player_two_positions:
-            if position[coords[0]][coords[1]] == 0:
-                win = False
-            elif position[coords[0]][coords[1]] == 1:
-                enemy = True
-        if win and enemy:
-            return 1
-        return 0
-    
     def game_over(self):
         self.playing = False
         self.last_move = None
@@ -816,6 +904,7 @@ class HalmaGame:
         back_button.grid(row=5, column=1, columnspan=2)
     
     def new_game(self):
+        self.cancel_ai()
         if self.playing:
             self.current_player = 3 - self.current_player
             self.game_over()
@@ -828,11 +917,8 @@ class HalmaGame:
         player_two_id = self.db.get_player_id(self.player_names[1].get())
         date_played = datetime.today().strftime('%Y-%m-%d')
         time_played = datetime.now().strftime('%H:%M:%S')
-        game_id = self.db.add_game(player_one_id, player_two_id, self.current_player, self.grid_size.get(), date_played, time_played, self.num_moves)
-        for move in range(self.num_moves + 1):
-            pos = [[str(x) for x in row] for row in copy.deepcopy(self.move_history[move])]
-            pos_string = ",".join(["".join(x) for x in pos])
-            self.db.add_move(game_id, move + 1, pos_string)
+        rows = encode_positions([Position.from_board(board) for board in self.move_history[:self.num_moves + 1]])
+        self.db.save_game(player_one_id, player_two_id, self.current_player, self.grid_size.get(), date_played, time_played, self.num_moves, rows)
         CTkMessagebox(title="Game Saved", 
                                 message="Game has successfully been saved!", 
                                 icon="check", 
@@ -857,11 +943,13 @@ class HalmaGame:
 
         if self.analysing:
             self.in_play = False
-            if self.process:
-                self.terminate_thread(self.process)
             self.best_move = []
-            self.eval_label.grid_forget()
-            self.best_move_button.grid(row=2, columnspan=4)
+            if self.cancel_analysis():
+                # Carry on analysing from the position now shown
+                self.view_best_move()
+            else:
+                self.eval_label.grid_forget()
+                self.best_move_button.grid(row=2, columnspan=4)
         
         self.draw_board()
 
@@ -884,16 +972,18 @@ class HalmaGame:
         self.set_in_play()
 
     def undo(self):
+        # If the AI was still thinking only the opponent's last move is taken back
+        thinking = self.cancel_ai()
         self.move_history.pop()
         self.board = copy.deepcopy(self.move_history[-1])
         self.num_moves -= 1
-        if self.ai_player:
+        if self.ai_player and not thinking:
             self.move_history.pop()
             self.board = copy.deepcopy(self.move_history[-1])
             self.num_moves -= 1
         else:
             self.current_player = 3 - self.current_player
-            self.info_string.set(self.player_names[self.current_player - 1].get() + "'s Turn")
+            self.info_string.set(self.turn_text())
         self.undo_button.configure(state="disabled")
         self.show_move = self.num_moves
         self.selected_piece = None
@@ -911,31 +1001,15 @@ class HalmaGame:
         self.switch_player()
 
     def on_closing(self):
+        self.cancel_ai()
+        self.cancel_analysis()
         self.db.add_config(self.grid_size.get(), self.board_colours.get(), self.theme.get())
         self.db.close_con()
+        if self.AI_WORKERS > 1:
+            self.ai_search.close()
         self.root.destroy()
 
-    def terminate_thread(self, thread):
-        # Subroutine taken from https://stackoverflow.com/questions/323972/is-there-any-way-to-kill-a-thread
-        """Terminates a python thread from another thread.
-
-        :param thread: a threading.Thread instance
-        """
-        if not thread.is_alive():
-            return
-
-        exc = ctypes.py_object(SystemExit)
-        res = ctypes.pythonapi.PyThreadState_SetAsyncExc(
-            ctypes.c_long(thread.ident), exc)
-        if res == 0:
-            raise ValueError("nonexistent thread id")
-        elif res > 1:
-            # """if it returns a number greater than one, you're in trouble,
-            # and you should call it again with exc=NULL to revert the effect"""
-            ctypes.pythonapi.PyThreadState_SetAsyncExc(thread.ident, None)
-            raise SystemError("PyThreadState_SetAsyncExc failed")
-        
-        
+
 class ToplevelWindow(ctk.CTkToplevel):
     def __init__(self, value, BUTTON_HEIGHT, BUTTON_WIDTH, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -947,7 +1021,8 @@ class ToplevelWindow(ctk.CTkToplevel):
         self.db = DatabaseManager("halma.db")
         players = [""] + self.db.get_player_names()
         self.headers = ["ID", "Player One", "Player Two", "Result", "Board Size", "Date", "Time", "Number of Moves"]
-        games = self.db.get_player_games(None)
+        # Player the games are filtered by, none for every game
+        self.player = None
 
         filter_label = ctk.CTkLabel(self, text="Filter By Player:")
         filter_label.grid(row=0)
@@ -958,7 +1033,7 @@ class ToplevelWindow(ctk.CTkToplevel):
 
         self.container = ctk.CTkFrame(self)
         self.container.grid(row=2)
-        self.games_list = MultiColumnListbox(self.container, self.headers, games)
+        self.games_list = MultiColumnListbox(self.container, self.headers, fetch=self.fetch_games)
 
         submit_button = ctk.CTkButton(self, height=self.BUTTON_HEIGHT, width=self.BUTTON_WIDTH, text="Analyse", command=self.submit)
         submit_button.grid(row=3)
@@ -979,12 +1054,16 @@ class ToplevelWindow(ctk.CTkToplevel):
             msg.get()
             self.grab_set()  
 
+    def fetch_games(self, sort, descending, after, limit):
+        # A page of games for the list, which loads them as it is scrolled
+        return self.db.get_games_page(self.player, sort, descending, after, limit)
+
     def filter(self, player):
         self.container.destroy()
-        games = self.db.get_player_games(player)
+        self.player = player or None
         self.container = ctk.CTkFrame(self)
         self.container.grid(row=2)
-        self.games_list = MultiColumnListbox(self.container, self.headers, games)
+        self.games_list = MultiColumnListbox(self.container, self.headers, fetch=self.fetch_games)
         
 
 if __name__ == "__main__":
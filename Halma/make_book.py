@@ -0,0 +1,99 @@
+import argparse
+import random
+import sqlite3
+from engine import MAX_SIZE, MIN_SIZE, OpeningBook, Position, Search, book_path, decode_row, move_between
+
+
+def archive_positions(db_name, size, plies):
+    # Positions from the first plies of every saved game of the board size, with the
+    # player who moved next in each
+    con = sqlite3.connect(db_name)
+    query = """SELECT move.game_id, move.position FROM move
+               JOIN game ON game.game_id = move.game_id
+               WHERE game.board_size = ? AND move.move_id <= ?
+               ORDER BY move.game_id, move.move_id;"""
+    found = []
+    previous_game = previous = None
+    for game_id, row in con.execute(query, (size, plies + 1)):
+        position = decode_row(row, previous if game_id == previous_game else None)
+        if game_id == previous_game:
+            played = move_between(previous, position)
+            if played:
+                found.append((previous, played[0]))
+        previous_game, previous = game_id, position
+    con.close()
+    return found
+
+
+def opening_positions(size, plies):
+    # Every position the first plies can reach, so the book has an answer to any start.
+    # Positions reached by the same moves in another order are only kept once.
+    found = []
+    layer = [Position.start(size)]
+    for ply in range(plies + 1):
+        player = 1 + ply % 2
+        found += [(position, player) for position in layer]
+        if ply < plies:
+            next_layer = {}
+            for position in layer:
+                for move in position.get_moves(player):
+                    child = position.copy()
+                    child.apply_move(move)
+                    next_layer[child.key(3 - player)] = child
+            layer = list(next_layer.values())
+    return found
+
+
+def self_play_positions(search, size, plies, games, depth, seed):
+    # Positions from games the engine plays against itself. Each game plays a random
+    # move at one of its plies so the games branch out from each other all through
+    # the opening, not just at the start.
+    generator = random.Random(seed)
+    found = []
+    for game in range(games):
+        position = Position.start(size)
+        random_ply = generator.randrange(plies)
+        for ply in range(plies):
+            player = 1 + ply % 2
+            if position.check_win():
+                break
+            found.append((position.copy(), player))
+            if ply == random_ply:
+                move = generator.choice(position.get_moves(player))
+            else:
+                move = search.best_move(position, depth, player == 1)[1]
+            position.apply_move(move)
+    return found
+
+
+def make_book(db_name, size, plies, games, every, depth, seed):
+    # Search every position found in the opening, the archive or self-play to depth and
+    # save the best move of each as the board size's book. The search is the GUI's AI
+    # without reductions, so a book move is the move the AI would play at that depth.
+    search = Search(lmr=False, futility=False)
+    positions = opening_positions(size, every) + archive_positions(db_name, size, plies)
+    positions += self_play_positions(search, size, plies, games, depth, seed)
+    moves = {}
+    for position, player in positions:
+        key = position.key(player)
+        if key not in moves:
+            moves[key] = search.best_move(position, depth, player == 1)[1]
+    # Won positions, or any the search found no move in, have nothing to store
+    moves = {key: move for key, move in moves.items() if move}
+    path = book_path(size)
+    OpeningBook.write(path, size, depth, moves)
+    print(f"{size}x{size}: {len(positions)} positions, {len(moves)} book moves written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build opening books from the saved games and self-play")
+    parser.add_argument("sizes", type=int, nargs="+", choices=range(MIN_SIZE, MAX_SIZE + 1), metavar="size")
+    parser.add_argument("--db", default="halma.db")
+    parser.add_argument("--plies", type=int, default=24, help="moves from the start of each game to include")
+    parser.add_argument("--games", type=int, default=200, help="self-play games per board size")
+    parser.add_argument("--every", type=int, default=3, help="plies from the start to include every position of")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    for size in args.sizes:
+        make_book(args.db, size, args.plies, args.games, args.every, args.depth, args.seed)
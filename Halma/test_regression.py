@@ -0,0 +1,111 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+from baseline import BaselineSearch
+from database import DatabaseManager
+from engine import GameRecord, Position, decode_row
+
+# Run with python -m pytest or python -m unittest from this folder
+
+
+def random_positions(size, plies, seed):
+    # The start position and every position after it in a game of random moves
+    generator = random.Random(seed)
+    position = Position.start(size)
+    positions = [position.copy()]
+    for ply in range(plies):
+        if position.check_win():
+            break
+        position.apply_move(generator.choice(position.get_moves(1 + ply % 2)))
+        positions.append(position.copy())
+    return positions
+
+
+class MoveGenerationTest(unittest.TestCase):
+    # Position's move generator against the get_valid_moves the GUI searched with
+    # before the engine package, as sets since the old one could list a jump twice
+
+    def test_same_moves_as_baseline(self):
+        for size in (8, 10, 16):
+            baseline = BaselineSearch(size)
+            for seed in range(5):
+                for position in random_positions(size, 60, seed)[::6]:
+                    board = position.to_board()
+                    for player in (1, 2):
+                        moves = [position.move_coords(move) for move in position.get_moves(player)]
+                        self.assertEqual(len(moves), len(set(moves)))
+                        self.assertEqual(set(moves), set(baseline.get_valid_moves(board, player == 1)),
+                                         f"{size}x{size} seed {seed} player {player}\n{position.to_string()}")
+
+
+class MoveMigrationTest(unittest.TestCase):
+    # Games saved as board text before the binary format are rewritten once by
+    # setup_tables and read back as the same positions
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "old.db")
+        # The move table as it was created before the binary format, with games saved a
+        # board of text per row the way the GUI used to
+        con = sqlite3.connect(self.path)
+        con.execute("""CREATE TABLE move (game_id integer NOT NULL, move_id integer NOT NULL,
+                       position text NOT NULL, PRIMARY KEY (game_id, move_id));""")
+        self.games = {1: random_positions(10, 80, 1), 2: random_positions(8, 50, 2)}
+        # A position two moves on from the one before it, which has to be a keyframe
+        del self.games[2][20]
+        for game_id, positions in self.games.items():
+            con.executemany("""INSERT INTO move(game_id, move_id, position) VALUES (?,?,?);""",
+                            [(game_id, move + 1, position.to_string()) for move, position in enumerate(positions)])
+        con.commit()
+        con.close()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def dump(self):
+        con = sqlite3.connect(self.path)
+        rows = con.execute("""SELECT game_id, move_id, position FROM move ORDER BY game_id, move_id;""").fetchall()
+        con.close()
+        return rows
+
+    def test_positions_round_trip(self):
+        db = DatabaseManager(self.path)
+        self.assertEqual(db.get_schema_version(), 0)
+        db.setup_tables()
+        self.assertEqual(db.get_schema_version(), db.SCHEMA_VERSION)
+        for game_id, positions in self.games.items():
+            rows = [row[0] for row in db.get_moves(game_id)]
+            self.assertTrue(all(isinstance(row, bytes) for row in rows))
+            record = GameRecord(rows)
+            self.assertEqual([record.position(index).pieces for index in range(len(record))],
+                             [position.pieces for position in positions])
+            # Stepping back through the game rebuilds the same positions
+            self.assertEqual(record.position(len(rows) - 1).pieces, positions[-1].pieces)
+            self.assertEqual(record.position(0).pieces, positions[0].pieces)
+        db.close_con()
+
+    def test_second_run_changes_nothing(self):
+        db = DatabaseManager(self.path)
+        db.setup_tables()
+        migrated = self.dump()
+        self.assertEqual(db.migrate_moves(), 0)
+        db.setup_tables()
+        db.close_con()
+        self.assertEqual(self.dump(), migrated)
+        db = DatabaseManager(self.path)
+        db.setup_tables()
+        self.assertEqual(db.get_schema_version(), db.SCHEMA_VERSION)
+        db.close_con()
+        self.assertEqual(self.dump(), migrated)
+
+    def test_text_rows_still_read(self):
+        # Rows are read the same way whether or not they have been migrated yet
+        for game_id, positions in self.games.items():
+            rows = [row[2] for row in self.dump() if row[0] == game_id]
+            self.assertEqual(decode_row(rows[-1]).pieces, positions[-1].pieces)
+
+
+if __name__ == "__main__":
+    unittest.main()
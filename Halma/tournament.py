@@ -0,0 +1,188 @@
+import argparse
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from database import DatabaseManager
+from engine import MAX_SIZE, MIN_SIZE, MCTS, Evaluator, Search, encode_positions, evaluate, load_weights, play_game
+
+ENGINES = ("minimax", "mcts")
+# Engine configurations are written kind:depth[:option=value...], for example
+# minimax:3, minimax:4:lmr=0:time=1 or mcts:2:rollout=4, with these options
+OPTIONS = {
+    # Seconds a move, no limit by default
+    "time": float,
+    # weighted for the tuned Evaluator, distance for the plain distance evaluation or
+    # the path of a weight file written by tune.py
+    "eval": str,
+    # Pruning switches and transposition table megabytes of minimax
+    "pvs": int, "lmr": int, "futility": int, "table": int,
+    # Plies of heuristic rollout before MCTS scores a leaf
+    "rollout": int,
+}
+
+# Engines of a worker process by configuration, kept between games
+_engines = {}
+
+
+def parse_engine(spec):
+    # (kind, depth, {option: value}) of a configuration, raises ValueError if it is not valid
+    kind, *rest = spec.split(":")
+    if kind not in ENGINES:
+        raise ValueError(f"unknown engine {kind!r}, expected one of {', '.join(ENGINES)}")
+    depth = int(rest.pop(0)) if rest and rest[0].isdigit() else 3
+    options = {}
+    for option in rest:
+        key, _, value = option.partition("=")
+        if key not in OPTIONS:
+            raise ValueError(f"unknown option {key!r} in {spec!r}")
+        options[key] = OPTIONS[key](value)
+    return kind, depth, options
+
+
+def engine_spec(spec):
+    # argparse type checking a configuration while leaving it as text for the workers
+    try:
+        parse_engine(spec)
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(str(error))
+    return spec
+
+
+def make_engine(spec):
+    # (engine, depth, seconds a move) of a configuration
+    kind, depth, options = parse_engine(spec)
+    name = options.pop("eval", "weighted")
+    if name == "distance":
+        evaluator = evaluate
+    elif name == "weighted":
+        evaluator = Evaluator()
+    else:
+        evaluator = Evaluator(load_weights(name))
+    time_limit = options.pop("time", None)
+    if kind == "mcts":
+        engine = MCTS(evaluator, options.get("rollout", 0))
+    else:
+        switches = {key: bool(options[key]) for key in ("pvs", "lmr", "futility") if key in options}
+        engine = Search(options.get("table", 16), evaluator, **switches)
+    return engine, depth, time_limit
+
+
+def play_match(specs, size, max_plies, random_plies, seed):
+    # Runs in a worker: play one game between two configurations, player one's first.
+    # Returns (winner, rows to save or None if nobody won, {player: [nodes, moves,
+    # seconds]}); see play_game for how unfinished games are decided.
+    for spec in specs:
+        if spec not in _engines:
+            _engines[spec] = make_engine(spec)
+    players = {1: _engines[specs[0]], 2: _engines[specs[1]]}
+    winner, finished, positions, stats = play_game(players, size, max_plies, random_plies, seed)
+    return winner, encode_positions(positions) if finished else None, stats
+
+
+def elo_difference(points, games):
+    # Rating difference that expects the score, held back from infinity when every game
+    # was won or lost
+    score = min(max(points / games, 0.5 / games), 1 - 0.5 / games)
+    return -400 * math.log10(1 / score - 1)
+
+
+def tournament(db_name, specs, size, games, workers, batch, max_plies, random_plies, seed):
+    # Every configuration plays games against every other, half with each colour, and
+    # each opening is played once with each colour. Won games are saved batch at a
+    # time; games decided on distance count towards the scores but are not saved, so
+    # the archive, the player stats and tune.py only ever see real results.
+    # Returns the Elo difference of every pairing and the nodes/s of every configuration.
+    db = DatabaseManager(db_name)
+    db.setup_tables()
+    for spec in specs:
+        db.add_player(spec, True)
+    player_ids = {spec: db.get_player_id(spec) for spec in specs}
+
+    pairings = [(first, second) for index, first in enumerate(specs) for second in specs[index + 1:]]
+    # [nodes, moves, seconds] of each configuration, and (points, draws, games) of the
+    # first of each pairing against the second
+    totals = {spec: [0, 0, 0.0] for spec in specs}
+    results = {pairing: [0.0, 0, 0] for pairing in pairings}
+    pending = []
+    unfinished = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        futures = {}
+        for pairing in pairings:
+            for game in range(games):
+                players = pairing if game % 2 == 0 else pairing[::-1]
+                future = pool.submit(play_match, players, size, max_plies, random_plies, seed + game // 2)
+                futures[future] = (pairing, players)
+        for future in as_completed(futures):
+            pairing, players = futures[future]
+            winner, rows, stats = future.result()
+            for player in (1, 2):
+                for index in range(3):
+                    totals[players[player - 1]][index] += stats[player][index]
+            result = results[pairing]
+            result[0] += 0.5 if winner == 0 else winner == players.index(pairing[0]) + 1
+            result[1] += winner == 0
+            result[2] += 1
+            if rows is None:
+                unfinished += 1
+                continue
+            now = datetime.now()
+            pending.append((player_ids[players[0]], player_ids[players[1]], winner, size, now.strftime('%Y-%m-%d'),
+                            now.strftime('%H:%M:%S'), len(rows) - 1, rows))
+            if len(pending) >= batch:
+                db.add_games(pending)
+                pending = []
+    if pending:
+        db.add_games(pending)
+    db.close_con()
+    elapsed = time.perf_counter() - start
+
+    played = sum(result[2] for result in results.values())
+    print(f"{played} {size}x{size} games in {elapsed:.1f} s, {played * 3600 / elapsed:.0f} games/hour")
+    if unfinished:
+        print(f"  {unfinished} reached {max_plies} plies, decided on distance and not saved")
+    speeds = {}
+    for spec in specs:
+        nodes, moves, seconds = totals[spec]
+        speeds[spec] = nodes / seconds if seconds else 0
+        latency = seconds / moves * 1000 if moves else 0
+        print(f"  {spec:<24} {speeds[spec]:>10.0f} nodes/s {latency:>8.1f} ms a move")
+    elo = {}
+    for (first, second), (points, draws, count) in results.items():
+        elo[(first, second)] = elo_difference(points, count)
+        print(f"  {first} vs {second}: {points:g}/{count} points, {draws} draws, Elo {elo[(first, second)]:+.0f}")
+    return elo, speeds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Play engine configurations against each other and save the games")
+    parser.add_argument("engines", type=engine_spec, nargs="+", help="configurations as kind:depth[:option=value...]")
+    parser.add_argument("--db", default="halma.db")
+    parser.add_argument("--size", type=int, default=10, choices=range(MIN_SIZE, MAX_SIZE + 1), metavar="size")
+    parser.add_argument("--games", type=int, default=10, help="games between each pair of configurations")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch", type=int, default=10, help="games saved to the database at once")
+    parser.add_argument("--max-plies", type=int, default=400, help="plies before a game is decided on distance")
+    parser.add_argument("--random-plies", type=int, default=2, help="random moves at the start of each game")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-elo", type=float, help="fail unless the first configuration scores at least this Elo against the second")
+    parser.add_argument("--min-speed", type=float, help="fail unless the first configuration has at least this fraction of the second's nodes/s")
+    args = parser.parse_args()
+    if len(set(args.engines)) != len(args.engines) or len(args.engines) < 2:
+        parser.error("at least two different engine configurations are needed")
+    elo, speeds = tournament(args.db, args.engines, args.size, args.games, args.workers, args.batch,
+                             args.max_plies, args.random_plies, args.seed)
+
+    # Regression gate: the first configuration is the candidate, the second the baseline
+    candidate, baseline = args.engines[:2]
+    failed = []
+    if args.min_elo is not None and elo[(candidate, baseline)] < args.min_elo:
+        failed.append(f"Elo {elo[(candidate, baseline)]:+.0f} is below {args.min_elo:+.0f}")
+    if args.min_speed is not None and speeds[candidate] < args.min_speed * speeds[baseline]:
+        failed.append(f"nodes/s {speeds[candidate]:.0f} is below {args.min_speed:g} x {speeds[baseline]:.0f}")
+    if failed:
+        print(f"{candidate} failed against {baseline}: " + ", ".join(failed))
+        sys.exit(1)
@@ -0,0 +1,94 @@
+import argparse
+import sqlite3
+import numpy
+from engine import FEATURES, MAX_SIZE, MIN_SIZE, Evaluator, decode_row, save_weights
+from engine.evaluation import WEIGHTS_FILE
+
+# Texel tuning: the evaluation is turned into player one's chance of winning with
+# sigmoid(K * evaluation) and the weights are fitted so that chance matches the
+# results of saved games as closely as possible
+
+
+def load_positions(db_name, evaluator, skip):
+    # Stream every saved position out of the database and return, for each board size,
+    # the feature values of its positions and player one's result: 1 for a win, 0.5
+    # for a draw and 0 for a loss.
+    # The first skip positions of each game are left out, they are the same every game,
+    # but still read as the positions after them are stored as moves from them.
+    con = sqlite3.connect(db_name)
+    query = """SELECT move.game_id, move.move_id, game.board_size, game.result, move.position FROM move
+               JOIN game ON game.game_id = move.game_id
+               ORDER BY move.game_id, move.move_id;"""
+    data = {}
+    previous_game = position = None
+    for game_id, move_id, board_size, result, row in con.execute(query):
+        position = decode_row(row, position if game_id == previous_game else None)
+        previous_game = game_id
+        # Won positions are scored as wins whatever the weights
+        if move_id <= skip or not MIN_SIZE <= board_size <= MAX_SIZE or position.check_win():
+            continue
+        features, results = data.setdefault(board_size, ([], []))
+        features.append(evaluator.features(position))
+        results.append(1.0 if result == 1 else 0.5 if result == 0 else 0.0)
+    games = {size: count for size, count in con.execute("SELECT board_size, COUNT(*) FROM game GROUP BY board_size;")}
+    con.close()
+    return {size: (numpy.array(features, dtype=float), numpy.array(results)) for size, (features, results) in data.items()}, games
+
+
+def error(features, results, weights, k):
+    # Mean squared difference between the predicted chances and the results
+    predicted = 1 / (1 + numpy.exp(-k * features @ weights))
+    return float(numpy.mean((predicted - results) ** 2))
+
+
+def fit(features, results, start, k, steps, rate, l2):
+    # Gradient descent on the mean squared error, starting from the current weights.
+    # Each feature is divided by its spread so one learning rate suits them all, and
+    # l2 pulls the weights back towards the start so a few games cannot move them far.
+    scale = features.std(axis=0)
+    scale[scale == 0] = 1
+    x = features / scale
+    initial = k * numpy.array(start, dtype=float) * scale
+    weights = initial.copy()
+    for step in range(steps):
+        predicted = 1 / (1 + numpy.exp(-x @ weights))
+        gradient = 2 * ((predicted - results) * predicted * (1 - predicted)) @ x / len(results)
+        weights -= rate * (gradient + 2 * l2 * (weights - initial))
+    return weights / (k * scale)
+
+
+def tune(db_name, output, steps, rate, l2, skip):
+    evaluator = Evaluator()
+    data, games = load_positions(db_name, evaluator, skip)
+    weights = {}
+    for size in sorted(data):
+        features, results = data[size]
+        start = evaluator.weights[size]
+        # An evaluation of a quarter of the win score gives about a three in four chance
+        k = 4 / (size * 50)
+        fitted = numpy.round(fit(features, results, start, k, steps, rate, l2)).astype(int)
+        before = error(features, results, numpy.array(start), k)
+        after = error(features, results, fitted, k)
+        print(f"{size}x{size}: {games.get(size, 0)} games {len(results)} positions  error {before:.4f} -> {after:.4f}")
+        print("  " + "  ".join(f"{name} {old} -> {new}" for name, old, new in zip(FEATURES, start, fitted)))
+        # Rounding can lose the improvement on small data sets, keep the old weights then
+        weights[size] = fitted.tolist() if after < before else start
+    if not weights:
+        print("No saved games to tune from")
+        return None
+    # Keep weights already tuned for sizes with no games this time
+    weights = {**evaluator.weights, **weights}
+    save_weights(weights, output, positions=sum(len(results) for features, results in data.values()), games=sum(games.values()))
+    print(f"Weights written to {output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights from the games saved in the database")
+    parser.add_argument("--db", default="halma.db")
+    parser.add_argument("--output", default=WEIGHTS_FILE)
+    parser.add_argument("--steps", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=1.0)
+    parser.add_argument("--l2", type=float, default=0.01, help="how strongly the weights are held near their current values")
+    parser.add_argument("--skip", type=int, default=1, help="positions at the start of each game to leave out")
+    args = parser.parse_args()
+    tune(args.db, args.output, args.steps, args.rate, args.l2, args.skip)